@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sys
 import json
 import time
 import re
@@ -16,6 +17,12 @@ from transformers import CLIPProcessor, CLIPModel, pipeline
 import nltk
 import logging
 
+# 作为脚本运行时项目根目录不在导入路径中，加入后才能导入 jsonio；
+# 以 api.processors 包的形式导入时根目录已在导入路径中，不做改动
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from jsonio import write_images_json
+
 # 设置日志记录
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -328,38 +335,41 @@ def extract_main_noun_fallback(caption):
     print(f"提取的主体名词(备用方法): {main_noun}")
     return main_noun
 
+# 预定义标签列表（分类时按此顺序匹配）
+PREDEFINED_TAGS = [
+    "christmas", "flower", "book", "dog", "car", "cat", "pumpkin", 
+    "apple", "airplane", "birthday", "crown", "gun", "baby", 
+    "camera", "money", "bird", "others"
+]
+
+# 同义词映射，帮助匹配更多变体
+TAG_SYNONYMS = {
+    "car": ["vehicle", "truck", "automobile", "jeep", "suv"],
+    "airplane": ["plane", "aircraft", "jet", "airliner"],
+    "flower": ["rose", "tulip", "floral", "blossom", "petal"],
+    "book": ["novel", "textbook", "journal"],
+    "dog": ["puppy", "canine", "hound"],
+    "cat": ["kitten", "feline", "kitty"],
+    "baby": ["infant", "newborn", "child", "toddler"],
+    "camera": ["dslr", "photography", "lens", "digital camera"],
+    "gun": ["pistol", "rifle", "firearm", "revolver", "weapon"],
+    "money": ["cash", "currency", "dollars", "bills", "coins"],
+    "christmas": ["xmas", "holiday", "santa", "december"],
+    "crown": ["tiara", "diadem", "coronet", "royal"],
+    "bird": ["sparrow", "parrot", "avian", "wing", "feather"]
+}
+
+# 描述分词用的正则
+CAPTION_WORD_RE = re.compile(r'\b\w+\b')
+
 def classify_image_to_predefined_tags(caption, extracted_noun=None):
     """将图片基于描述分类到预定义的标签列表中"""
-    # 更新的标签列表
-    predefined_tags = [
-        "christmas", "flower", "book", "dog", "car", "cat", "pumpkin", 
-        "apple", "airplane", "birthday", "crown", "gun", "baby", 
-        "camera", "money", "bird", "others"
-    ]
-    
-    # 同义词映射，帮助匹配更多变体
-    synonyms = {
-        "car": ["vehicle", "truck", "automobile", "jeep", "suv"],
-        "airplane": ["plane", "aircraft", "jet", "airliner"],
-        "flower": ["rose", "tulip", "floral", "blossom", "petal"],
-        "book": ["novel", "textbook", "journal"],
-        "dog": ["puppy", "canine", "hound"],
-        "cat": ["kitten", "feline", "kitty"],
-        "baby": ["infant", "newborn", "child", "toddler"],
-        "camera": ["dslr", "photography", "lens", "digital camera"],
-        "gun": ["pistol", "rifle", "firearm", "revolver", "weapon"],
-        "money": ["cash", "currency", "dollars", "bills", "coins"],
-        "christmas": ["xmas", "holiday", "santa", "december"],
-        "crown": ["tiara", "diadem", "coronet", "royal"],
-        "bird": ["sparrow", "parrot", "avian", "wing", "feather"]
-    }
-    
     # 将描述转为小写便于匹配
     caption_lower = caption.lower()
     matched_tags = []
     
-    # 将描述文本分词
-    words = re.findall(r'\b\w+\b', caption_lower)
+    # 将描述文本分词（集合，只用于判断单词是否出现）
+    words = set(CAPTION_WORD_RE.findall(caption_lower))
     
     # 1. 首先尝试使用提取的主体名词进行匹配（提高优先级）
     if extracted_noun:
@@ -381,27 +391,27 @@ def classify_image_to_predefined_tags(caption, extracted_noun=None):
                 extracted_lower = str(extracted_noun).lower()
         
         # 直接匹配标签
-        if extracted_lower in predefined_tags and extracted_lower != "others":
+        if extracted_lower in PREDEFINED_TAGS and extracted_lower != "others":
             matched_tags.append(extracted_lower)
         else:
             # 匹配同义词
-            for tag, tag_synonyms in synonyms.items():
+            for tag, tag_synonyms in TAG_SYNONYMS.items():
                 if extracted_lower in tag_synonyms:
                     matched_tags.append(tag)
                     break
     
     # 2. 如果主体名词没有匹配成功，使用单词边界匹配
     if not matched_tags:
-        for tag in predefined_tags:
+        for tag in PREDEFINED_TAGS:
             if tag != "others" and tag in words:  # 检查完整单词匹配
                 matched_tags.append(tag)
                 break
                 
         # 3. 检查同义词（使用单词边界匹配）
         if not matched_tags:
-            for tag in predefined_tags:
-                if tag in synonyms:
-                    for synonym in synonyms[tag]:
+            for tag in PREDEFINED_TAGS:
+                if tag in TAG_SYNONYMS:
+                    for synonym in TAG_SYNONYMS[tag]:
                         if synonym in words:  # 检查完整单词匹配
                             matched_tags.append(tag)
                             break
@@ -570,15 +580,13 @@ def process_images_batch(input_dir, output_file, limit=None):
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     
     # 保存元数据到主数据源目录 (api/data)
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(all_metadata, f, indent=2, ensure_ascii=False)
+    write_images_json(output_file, all_metadata)
     
     # 同时保存到前端项目目录
     project_data_dir = "project/src/data"
     os.makedirs(project_data_dir, exist_ok=True)
     project_output_file = os.path.join(project_data_dir, "images.json")
-    with open(project_output_file, 'w', encoding='utf-8') as f:
-        json.dump(all_metadata, f, indent=2, ensure_ascii=False)
+    write_images_json(project_output_file, all_metadata)
     
     # 记录缺失原始图片的条目
     if missing_originals:
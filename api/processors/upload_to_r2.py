@@ -21,6 +21,12 @@ import argparse
 from botocore.config import Config
 from datetime import datetime
 
+# 作为脚本运行时项目根目录不在导入路径中，加入后才能导入 jsonio；
+# 以 api.processors 包的形式导入时根目录已在导入路径中，不做改动
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from jsonio import write_images_json
+
 # 从环境变量获取R2凭证（如果没有则使用默认值）
 r2_account_id = os.environ.get("R2_ACCOUNT_ID", "eee5ee0e6f10e25f8307eed29ac2eef7")
 r2_access_key_id = os.environ.get("R2_ACCESS_KEY_ID", "2acb10f86d217ef811c5cba5a175c853")
@@ -185,14 +191,12 @@ def update_metadata_with_r2_urls(images_json_path="api/data/images.json"):
         print(f"已备份原始元数据文件: {backup_path}")
         
         # 写入更新后的元数据
-        with open(images_json_path, 'w', encoding='utf-8') as f:
-            json.dump(updated_images, f, indent=2, ensure_ascii=False)
+        write_images_json(images_json_path, updated_images)
         
         # 同时更新前端数据文件
         frontend_path = "project/src/data/images.json"
         if os.path.exists(frontend_path):
-            with open(frontend_path, 'w', encoding='utf-8') as f:
-                json.dump(updated_images, f, indent=2, ensure_ascii=False)
+            write_images_json(frontend_path, updated_images)
             print(f"已更新前端数据文件: {frontend_path}")
         
         print(f"已更新元数据文件中的URL为R2 CDN: {images_json_path}")
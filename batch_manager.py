@@ -42,10 +42,18 @@ METADATA_DIR = "metadata"
 BATCH_RECORD_FILE = os.path.join(METADATA_DIR, "batches.json")
 
 def ensure_dir_exists(directory):
-    """确保目录存在，不存在则创建"""
-    if not os.path.exists(directory):
+    """确保目录存在，不存在则创建
+    
+    直接尝试创建而不是先检查是否存在，目录已存在时省去一次stat调用
+    """
+    try:
+        os.mkdir(directory)
+    except FileExistsError:
+        return
+    except FileNotFoundError:
+        # 父目录不存在，递归创建
         os.makedirs(directory, exist_ok=True)
-        logger.info(f"已创建目录: {directory}")
+    logger.info(f"已创建目录: {directory}")
 
 def get_current_date():
     """获取当前日期字符串 (YYYYMMDD)"""
@@ -70,7 +78,11 @@ def save_batch_records(records):
     logger.info(f"批次记录已保存到: {BATCH_RECORD_FILE}")
 
 def create_batch(batch_date=None):
-    """创建新批次"""
+    """创建新批次
+    
+    Returns:
+        tuple: (批次日期, 批次记录字典, 全部批次记录)，调用方可直接修改批次后一次性保存
+    """
     # 如果未指定日期，使用当前日期
     if batch_date is None:
         batch_date = get_current_date()
@@ -88,7 +100,7 @@ def create_batch(batch_date=None):
     for existing_batch in records["batches"]:
         if existing_batch["date"] == batch_date:
             logger.info(f"批次 {batch_date} 已存在，将使用现有批次")
-            return batch_date
+            return batch_date, existing_batch, records
     
     # 创建批次目录
     batch_input_dir = os.path.join(UNSPLASH_IMAGES_DIR, batch_date)
@@ -101,7 +113,7 @@ def create_batch(batch_date=None):
     ensure_dir_exists(batch_temp_dir)
     
     # 添加新批次记录
-    records["batches"].append({
+    batch = {
         "date": batch_date,
         "created_at": datetime.now().isoformat(),
         "status": "created",
@@ -110,14 +122,15 @@ def create_batch(batch_date=None):
         "temp_dir": batch_temp_dir,
         "image_count": 0,
         "processed_count": 0
-    })
+    }
+    records["batches"].append(batch)
     
     save_batch_records(records)
     logger.info(f"已创建新批次: {batch_date}")
     logger.info(f"原始图片目录: {batch_input_dir}")
     logger.info(f"输出图片目录: {batch_output_dir}")
     
-    return batch_date
+    return batch_date, batch, records
 
 def list_batches():
     """列出所有批次"""
@@ -156,17 +169,39 @@ def get_batch_status(batch_date):
         print(f"未找到批次: {batch_date}")
         return
     
-    # 更新当前状态
-    batch_input_dir = batch["input_dir"]
-    batch_output_dir = batch["output_dir"]
+    update_batch_counts(batch)
+    
+    # 保存更新后的记录
+    save_batch_records(records)
     
-    # 统计原始图片数量
-    jpg_files = glob.glob(os.path.join(batch_input_dir, "*.jpg"))
-    batch["image_count"] = len(jpg_files)
+    print_batch_status(batch)
     
-    # 统计已处理图片数量
-    processed_files = glob.glob(os.path.join(batch_output_dir, "*_cropped.png"))
-    batch["processed_count"] = len(processed_files)
+    return batch
+
+def _count_batch(input_dir, output_dir):
+    """统计批次原始图片(*.jpg)和已处理图片(*_cropped.png)的数量
+    
+    只需要数量，因此用scandir加后缀判断代替glob，避免构建文件列表和通配符匹配
+    
+    Returns:
+        tuple: (原始图片数量, 已处理图片数量)
+    """
+    image_count = processed_count = 0
+    try:
+        with os.scandir(input_dir) as it:
+            image_count = sum(1 for e in it if e.name.endswith(".jpg") and not e.name.startswith("."))
+    except FileNotFoundError:
+        pass
+    try:
+        with os.scandir(output_dir) as it:
+            processed_count = sum(1 for e in it if e.name.endswith("_cropped.png") and not e.name.startswith("."))
+    except FileNotFoundError:
+        pass
+    return image_count, processed_count
+
+def update_batch_counts(batch):
+    """根据批次目录中的文件统计图片数量并更新状态（不读写批次记录文件）"""
+    batch["image_count"], batch["processed_count"] = _count_batch(batch["input_dir"], batch["output_dir"])
     
     # 更新状态
     if batch["processed_count"] == 0:
@@ -175,40 +210,24 @@ def get_batch_status(batch_date):
         batch["status"] = "processing"
     else:
         batch["status"] = "completed"
-    
-    # 保存更新后的记录
-    save_batch_records(records)
-    
-    # 显示状态
-    print(f"\n===== 批次 {batch_date} 状态 =====")
+
+def print_batch_status(batch):
+    """显示批次状态"""
+    print(f"\n===== 批次 {batch['date']} 状态 =====")
     print(f"图片总数: {batch['image_count']}")
     print(f"已处理数: {batch['processed_count']}")
     print(f"处理进度: {batch['processed_count']}/{batch['image_count']} ({round(batch['processed_count']*100/max(1, batch['image_count']), 1)}%)")
     print(f"当前状态: {batch['status']}")
     print(f"输入目录: {batch['input_dir']}")
     print(f"输出目录: {batch['output_dir']}")
-    
-    return batch
 
 def import_images(source_dir, batch_date=None):
     """导入图片到批次"""
     if batch_date is None:
         batch_date = get_current_date()
     
-    # 确保批次存在
-    create_batch(batch_date)
-    
-    # 获取批次输入目录
-    records = load_batch_records()
-    batch = None
-    for b in records["batches"]:
-        if b["date"] == batch_date:
-            batch = b
-            break
-    
-    if not batch:
-        print(f"未找到批次: {batch_date}")
-        return 0
+    # 确保批次存在，直接使用返回的批次记录
+    batch_date, batch, records = create_batch(batch_date)
     
     batch_input_dir = batch["input_dir"]
     
@@ -219,21 +238,32 @@ def import_images(source_dir, batch_date=None):
     
     # 复制图片到批次目录
     copied_count = 0
+    # 逐文件输出先缓存，每100条批量写到stdout，减少写调用次数
+    import_lines = []
+    # 路径前缀在循环外拼好，循环内直接字符串拼接
+    src_prefix = os.path.join(source_dir, '')
+    dst_prefix = os.path.join(batch_input_dir, '')
     for file in os.listdir(source_dir):
         if file.lower().endswith(('.jpg', '.jpeg')):
-            src_path = os.path.join(source_dir, file)
-            dst_path = os.path.join(batch_input_dir, file)
+            src_path = src_prefix + file
+            dst_path = dst_prefix + file
             
             # 如果目标文件已存在，添加时间戳避免覆盖
             if os.path.exists(dst_path):
-                file_name, file_ext = os.path.splitext(file)
+                file_name, _, file_ext = file.rpartition('.')
                 time_suffix = datetime.now().strftime('%H%M%S')
-                dst_path = os.path.join(batch_input_dir, f"{file_name}_{time_suffix}{file_ext}")
+                dst_path = f"{dst_prefix}{file_name}_{time_suffix}.{file_ext}"
             
             # 复制文件
             shutil.copy2(src_path, dst_path)
             copied_count += 1
-            print(f"已导入: {os.path.basename(dst_path)}")
+            import_lines.append(f"已导入: {os.path.basename(dst_path)}")
+            if len(import_lines) >= 100:
+                sys.stdout.write('\n'.join(import_lines) + '\n')
+                import_lines.clear()
+    
+    if import_lines:
+        sys.stdout.write('\n'.join(import_lines) + '\n')
     
     # 更新批次记录
     batch["image_count"] = len(glob.glob(os.path.join(batch_input_dir, "*.jpg")))
@@ -381,7 +411,7 @@ def main():
         
         # 确保批次存在
         batch_date = args.date if args.date else get_current_date()
-        create_batch(batch_date)
+        batch_date, batch, records = create_batch(batch_date)
         
         # 从Unsplash导入图片
         if args.id:
@@ -393,8 +423,10 @@ def main():
         if imported_paths:
             print(f"\n成功从Unsplash导入 {len(imported_paths)} 张图片到批次 {batch_date}")
             
-            # 更新批次记录
-            batch = get_batch_status(batch_date)
+            # 更新批次记录（复用已加载的记录，无需再次读取）
+            update_batch_counts(batch)
+            save_batch_records(records)
+            print_batch_status(batch)
     
     elif args.command == 'reset':
         reset_batch(args.date, args.confirm)
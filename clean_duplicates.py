@@ -4,15 +4,24 @@
 import os
 import re
 import logging
+import logging.handlers
 from datetime import datetime
 
 # 配置日志
+# 逐文件日志较多，通过MemoryHandler缓冲后批量写出，遇到ERROR立即刷新
+_log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+_log_targets = [
+    logging.FileHandler('clean_duplicates.log'),
+    logging.StreamHandler()
+]
+for _target in _log_targets:
+    _target.setFormatter(_log_formatter)
+
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('clean_duplicates.log'),
-        logging.StreamHandler()
+        logging.handlers.MemoryHandler(capacity=1000, flushLevel=logging.ERROR, target=_target)
+        for _target in _log_targets
     ]
 )
 logger = logging.getLogger('clean_duplicates')
@@ -41,8 +41,22 @@ def ensure_dir_exists(directory):
         os.makedirs(directory, exist_ok=True)
         logger.info(f"已创建目录: {directory}")
 
+def find_latest_backup():
+    """查找最近一次备份目录，没有则返回None"""
+    try:
+        with os.scandir(BACKUP_DIR) as it:
+            return max((e.path for e in it if e.is_dir()), default=None)
+    except FileNotFoundError:
+        return None
+
 def backup_images():
-    """备份原始图片"""
+    """备份原始图片
+    
+    与最近一次备份中大小和修改时间都相同的文件直接硬链接过去，不再复制内容
+    """
+    # 在创建新备份目录之前先找到上一次的备份
+    latest_backup = find_latest_backup()
+    
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     backup_path = os.path.join(BACKUP_DIR, timestamp)
     
@@ -59,14 +73,31 @@ def backup_images():
     
     # 复制文件
     copied_files = 0
-    for file in os.listdir(PUBLIC_IMAGES_DIR):
-        if file.endswith('.png'):
-            src_file = os.path.join(PUBLIC_IMAGES_DIR, file)
-            dst_file = os.path.join(backup_path, file)
-            shutil.copy2(src_file, dst_file)
+    linked_files = 0
+    with os.scandir(PUBLIC_IMAGES_DIR) as it:
+        for entry in it:
+            if not entry.name.endswith('.png'):
+                continue
+            dst_file = os.path.join(backup_path, entry.name)
+            
+            # 上次备份中的同名文件未变化时，硬链接代替复制
+            if latest_backup:
+                prev_file = os.path.join(latest_backup, entry.name)
+                try:
+                    st_src = entry.stat()
+                    st_prev = os.stat(prev_file)
+                    if (st_src.st_size, st_src.st_mtime_ns) == (st_prev.st_size, st_prev.st_mtime_ns):
+                        os.link(prev_file, dst_file)
+                        linked_files += 1
+                        continue
+                except OSError:
+                    pass
+            
+            shutil.copy2(entry.path, dst_file)
             copied_files += 1
     
-    logger.info(f"已备份 {copied_files} 个PNG文件到 {backup_path}")
+    logger.info(f"已备份 {copied_files + linked_files} 个PNG文件到 {backup_path} "
+                f"(复制 {copied_files} 个，未变化硬链接 {linked_files} 个)")
     return backup_path
 
 def compress_public_images(method="both", quality=85, oxipng_level=3):
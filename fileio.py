@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+文件复制工具
+
+统一各脚本复制图片文件的方式：优先在内核中复制（os.copy_file_range），
+同一文件系统下需要保留原文件时优先创建硬链接。
+"""
+
+import os
+import shutil
+
+def copy_file(src_file, dst_file):
+    """在内核中复制文件内容（os.copy_file_range），并保留元数据；不支持时退回 shutil.copy2
+
+    在支持reflink的文件系统（XFS、Btrfs）上只共享数据块，不实际搬运数据
+    """
+    try:
+        with open(src_file, 'rb') as sfd, open(dst_file, 'wb') as dfd:
+            remaining = os.fstat(sfd.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(sfd.fileno(), dfd.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        shutil.copystat(src_file, dst_file)
+    except (OSError, AttributeError):
+        shutil.copy2(src_file, dst_file)
+
+def link_or_copy(src_file, dst_file):
+    """优先创建硬链接（同一文件系统下不复制数据），无法链接时（跨设备等）退回 copy_file"""
+    try:
+        os.link(src_file, dst_file)
+    except OSError:
+        copy_file(src_file, dst_file)
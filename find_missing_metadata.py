@@ -48,9 +48,10 @@ def main():
     # 直接列出目录中的所有PNG文件
     all_png_files = []
     for root, dirs, files in os.walk(IMAGES_DIR):
+        root_prefix = os.path.join(root, '')
         for file in files:
             if file.endswith(".png"):
-                all_png_files.append(os.path.join(root, file))
+                all_png_files.append(root_prefix + file)
     
     print(f"在{IMAGES_DIR}目录中找到 {len(all_png_files)} 个PNG图片")
     print_sample_files(all_png_files)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+标签修正脚本（合并版）
+
+一次遍历同时完成原 fix_specific_tags.py 和 fix_metadata_tags.py 的修正：
+先按标题精确匹配 TITLE_TO_TAG，再按关键词/模糊匹配 CORRECTIONS。
+每个元数据文件只读取和写入一次。
+
+使用方法:
+    python3 fix_tags.py [--verbose] [--log-changes]
+"""
+
+import os
+import time
+import shutil
+import argparse
+import functools
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from jsonio import read_json, write_images_json
+from tag_rules import TITLE_TO_TAG, METADATA_FILES, CORRECT_TAG_LISTS, find_correct_tag
+
+def fix_tags_file(file_path, titles=True, keywords=True, verbose=False, log_changes=False):
+    """修正指定元数据文件中的标签
+
+    返回修改数量和该文件的输出行列表，由调用方统一打印，避免并行处理时输出交错
+
+    Args:
+        titles: 是否按 TITLE_TO_TAG 精确匹配标题
+        keywords: 是否按 CORRECTIONS 做关键词和模糊匹配
+        verbose: 是否输出每一项的修改详情
+        log_changes: 是否把每项修改的详细记录写入变更日志文件
+    """
+    log = []
+    if not os.path.exists(file_path):
+        log.append(f"文件不存在: {file_path}")
+        return 0, log
+
+    # 读取文件
+    data = read_json(file_path)
+
+    # 按标题建立索引：精确匹配只需遍历 TITLE_TO_TAG 中的目标标题，
+    # 其余描述每种只做一次关键词和模糊匹配
+    caption_index = defaultdict(list)
+    for item in data:
+        caption_index[item.get("caption", "")].append(item)
+
+    matches = []
+    if titles:
+        for caption, tag in TITLE_TO_TAG.items():
+            for item in caption_index.get(caption, ()):
+                matches.append((item, tag))
+    if keywords:
+        for caption, items in caption_index.items():
+            # 精确匹配的标题优先
+            if titles and caption in TITLE_TO_TAG:
+                continue
+            tag = find_correct_tag(caption)
+            if tag is not None:
+                for item in items:
+                    matches.append((item, tag))
+
+    # 计数器
+    modified_count = 0
+    changes_details = []
+
+    for item, tag in matches:
+        correct_tags = CORRECT_TAG_LISTS[tag]
+        if item.get("tags") != correct_tags:
+            # 原标签列表不会被修改，直接引用即可
+            caption = item.get("caption", "")
+            old_tags = item.get("tags", [])
+            item["tags"] = correct_tags
+            modified_count += 1
+            if verbose:
+                log.append(f"已修改: '{caption}'")
+                log.append(f"  旧标签: {old_tags}")
+                log.append(f"  新标签: {correct_tags}")
+            if log_changes:
+                changes_details.append((caption, old_tags, correct_tags))
+
+    # 保存修改后的文件
+    if modified_count > 0:
+        # 先把原文件硬链接为带时间戳的备份（不复制数据），再写入临时文件并原子替换
+        # 没有修改时不创建备份
+        backup_path = f"{file_path}.bak.{int(time.time())}"
+        try:
+            os.link(file_path, backup_path)
+        except OSError:
+            shutil.copyfile(file_path, backup_path)
+        write_images_json(file_path, data)
+        log.append(f"已保存修改，共修改 {modified_count} 项，备份: {backup_path}")
+
+        # 保存变更记录
+        if log_changes:
+            # 多个文件并行处理，日志文件名带上元数据路径避免互相覆盖
+            changes_log = f"metadata_changes_{int(time.time())}_{file_path.replace(os.sep, '_')}.log"
+            with open(changes_log, 'w', encoding='utf-8') as f:
+                for caption, old_tags, new_tags in changes_details:
+                    f.write(f"描述: {caption}\n")
+                    f.write(f"原标签: {old_tags}\n")
+                    f.write(f"新标签: {new_tags}\n")
+                    f.write("-" * 50 + "\n")
+            log.append(f"详细变更记录已保存到: {changes_log}")
+    else:
+        log.append("未找到需要修改的项目")
+
+    return modified_count, log
+
+def main(titles=True, keywords=True, verbose=False):
+    """主函数
+
+    fix_specific_tags.py 只做标题精确匹配（keywords=False），并默认输出每项修改；
+    fix_metadata_tags.py 只做关键词和模糊匹配（titles=False）
+    """
+    parser = argparse.ArgumentParser(description='修正元数据中的图片标签')
+    parser.add_argument('--log-changes', action='store_true',
+                        help='把每项修改的详细记录写入 metadata_changes_*.log')
+    parser.add_argument('--verbose', action='store_true', help='输出每一项的修改详情')
+    args = parser.parse_args()
+
+    print("开始修正元数据标签...")
+
+    # 各文件相互独立，分到多个进程并行处理
+    fix = functools.partial(fix_tags_file, titles=titles, keywords=keywords,
+                            verbose=verbose or args.verbose, log_changes=args.log_changes)
+    with ProcessPoolExecutor(max_workers=len(METADATA_FILES)) as executor:
+        results = list(executor.map(fix, METADATA_FILES))
+
+    total = 0
+    for file_path, (modified_count, log) in zip(METADATA_FILES, results):
+        print(f"\n处理文件: {file_path}")
+        for line in log:
+            print(line)
+        total += modified_count
+
+    print(f"\n处理完成! 共修改 {total} 项")
+
+if __name__ == "__main__":
+    main()
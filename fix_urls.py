@@ -3,46 +3,43 @@
 修复元数据文件中的重复URL问题
 """
 
-import json
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from jsonio import read_json, write_images_json
+
+R2_PUBLIC_URL = 'https://pub-ee5efd5217f84e8e8d4d7e15827887c7.r2.dev'
+
+# 匹配带重复前缀的URL（r2.dev/https://...），只保留最后一段文件名
+DUPLICATE_URL_RE = re.compile(r'^.*r2\.dev/https://.*?([^/]*)$')
+FIXED_URL_TEMPLATE = R2_PUBLIC_URL + r'/\1'
 
 def fix_duplicate_urls():
     """修复元数据文件中重复的URL前缀"""
     # 读取元数据文件
     input_file = 'project/src/data/images.json'
-    with open(input_file, 'r', encoding='utf-8') as f:
-        images_data = json.load(f)
+    images_data = read_json(input_file)
 
     # 修复URL
     fixed_count = 0
+    subn = DUPLICATE_URL_RE.subn
     for image in images_data:
-        # 修复png_url
-        png_url = image['png_url']
-        if 'r2.dev/https://' in png_url:
-            # 提取文件名
-            filename = png_url.split('/')[-1]
-            # 创建新的正确URL
-            image['png_url'] = f'https://pub-ee5efd5217f84e8e8d4d7e15827887c7.r2.dev/{filename}'
-            fixed_count += 1
-        
-        # 修复sticker_url
-        sticker_url = image['sticker_url']
-        if 'r2.dev/https://' in sticker_url:
-            # 提取文件名
-            filename = sticker_url.split('/')[-1]
-            # 创建新的正确URL
-            image['sticker_url'] = f'https://pub-ee5efd5217f84e8e8d4d7e15827887c7.r2.dev/{filename}'
-            fixed_count += 1
+        image['png_url'], n = subn(FIXED_URL_TEMPLATE, image['png_url'], count=1)
+        fixed_count += n
+        image['sticker_url'], n = subn(FIXED_URL_TEMPLATE, image['sticker_url'], count=1)
+        fixed_count += n
 
     # 保存修复后的元数据
-    with open(input_file, 'w', encoding='utf-8') as f:
-        json.dump(images_data, f, indent=2, ensure_ascii=False)
-
-    # 同时更新api目录中的元数据
     api_file = 'api/data/images.json'
+    outputs = [input_file]
     if os.path.exists(api_file):
-        with open(api_file, 'w', encoding='utf-8') as f:
-            json.dump(images_data, f, indent=2, ensure_ascii=False)
+        outputs.append(api_file)
+
+    # 同时更新api目录中的元数据，两个文件并行写入
+    with ThreadPoolExecutor(max_workers=len(outputs)) as executor:
+        list(executor.map(lambda output: write_images_json(output, images_data), outputs))
+
+    if len(outputs) > 1:
         print(f'已修复元数据文件中的重复URL，共修复了{fixed_count}个URL。更新了以下文件：')
         print(f'- {input_file}')
         print(f'- {api_file}')
@@ -26,6 +26,7 @@ import re
 import glob
 import sys
 from pathlib import Path
+from jsonio import write_images_json
 from slugify import slugify
 import torch
 import numpy as np
@@ -572,8 +573,7 @@ def process_images_batch(input_dir, output_file=None, limit=None):
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     
     # 保存元数据到JSON文件
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(all_metadata, f, ensure_ascii=False, indent=2)
+    write_images_json(output_file, all_metadata)
     
     # 记录缺失原始图片的条目
     if missing_originals:
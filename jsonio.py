@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+JSON 读写工具
+
+统一元数据 JSON 的读写方式：使用 orjson 序列化，以 64KB 缓冲的二进制模式读写。
+默认输出两个空格缩进（与 json.dump(indent=2, ensure_ascii=False) 的结果一致），
+compact=True 时输出紧凑格式。
+
+图片元数据文件统一通过 write_images_json 写入：api 目录的副本只给程序读取，
+写成紧凑格式；前端和 metadata 目录的副本保持缩进，便于阅读和比较差异。
+"""
+
+import os
+import orjson
+
+BUFFER_SIZE = 65536
+
+# api 目录的图片元数据副本
+API_IMAGES_FILE = os.path.join("api", "data", "images.json")
+
+def read_json(path):
+    """读取 JSON 文件"""
+    with open(path, 'rb', buffering=BUFFER_SIZE) as f:
+        return orjson.loads(f.read())
+
+def iter_jsonl(path):
+    """逐行读取 JSONL 文件，跳过空行"""
+    with open(path, 'rb', buffering=BUFFER_SIZE) as f:
+        for line in f:
+            if line.strip():
+                yield orjson.loads(line)
+
+def recover_jsonl(path):
+    """读取逐行追加写入的 JSONL 日志，返回其中完整的记录
+
+    上次写入中断时最后一行可能只写了一半，把文件截断到最后一个换行符之后，
+    接下来追加的记录不会和残缺的行拼在一起；无法解析的完整行直接跳过
+    """
+    records = []
+    end = 0
+    with open(path, 'r+b', buffering=BUFFER_SIZE) as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            end += len(line)
+            if line.strip():
+                try:
+                    records.append(orjson.loads(line))
+                except ValueError:
+                    pass
+        f.truncate(end)
+    return records
+
+def dumps_json(obj, compact=False):
+    """序列化为 JSON 字节串"""
+    if compact:
+        return orjson.dumps(obj)
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+def write_json(path, obj, compact=False):
+    """写入 JSON 文件"""
+    data = dumps_json(obj, compact)
+    with open(path, 'wb', buffering=BUFFER_SIZE) as f:
+        f.write(data)
+
+def is_api_images_file(path):
+    """判断路径是否为 api 目录的图片元数据副本"""
+    path = os.path.normpath(path)
+    return path == API_IMAGES_FILE or path.endswith(os.sep + API_IMAGES_FILE)
+
+def write_images_json(path, obj):
+    """写入图片元数据文件（先写临时文件再原子替换），api 目录的副本写成紧凑格式"""
+    tmp_path = f"{path}.tmp"
+    write_json(tmp_path, obj, compact=is_api_images_file(path))
+    os.replace(tmp_path, path)
@@ -4,7 +4,9 @@
 import os
 import shutil
 import logging
+import argparse
 from datetime import datetime
+from fileio import copy_file, link_or_copy
 
 # 配置日志
 logging.basicConfig(
@@ -23,12 +25,28 @@ TARGET_FOLDER = f"{DATE_PREFIX}_merged"
 # 批次文件夹所在路径
 BASE_PATH = "unsplash-images"
 
-def main():
+def transfer_file(src_file, dst_file, copy=False):
+    """将文件转移到合并文件夹
+    
+    默认直接移动（同一文件系统下只是改名，跨设备时复制后删除原文件）；
+    copy=True 时保留原文件，优先创建硬链接，无法链接时再复制
+    """
+    if not copy:
+        try:
+            os.rename(src_file, dst_file)
+        except OSError:
+            copy_file(src_file, dst_file)
+            os.remove(src_file)
+        return
+    link_or_copy(src_file, dst_file)
+
+def main(copy=False):
     # 获取所有批次文件夹
     all_folders = [d for d in os.listdir(BASE_PATH) if os.path.isdir(os.path.join(BASE_PATH, d))]
     
-    # 筛选出指定日期的批次文件夹
-    target_folders = [folder for folder in all_folders if folder.startswith(DATE_PREFIX)]
+    # 筛选出指定日期的批次文件夹（排除合并文件夹本身）
+    target_folders = [folder for folder in all_folders
+                      if folder.startswith(DATE_PREFIX) and folder != TARGET_FOLDER]
     
     if not target_folders:
         logging.warning(f"没有找到以 {DATE_PREFIX} 开头的批次文件夹")
@@ -45,25 +63,26 @@ def main():
         logging.info(f"合并文件夹已存在: {merged_path}")
     
     # 合并文件
+    # 合并文件夹中已有的文件名只读取一次，之后在内存中维护
+    merged_names = set(os.listdir(merged_path))
     total_files = 0
     for folder in target_folders:
         folder_path = os.path.join(BASE_PATH, folder)
-        files = [f for f in os.listdir(folder_path) if os.path.isfile(os.path.join(folder_path, f))]
+        with os.scandir(folder_path) as it:
+            entries = [e for e in it if e.is_file()]
         
-        for file in files:
-            src_file = os.path.join(folder_path, file)
-            dst_file = os.path.join(merged_path, file)
-            
+        for entry in entries:
             # 如果目标文件存在，则跳过
-            if os.path.exists(dst_file):
-                logging.info(f"文件已存在，跳过: {file}")
+            if entry.name in merged_names:
+                logging.info(f"文件已存在，跳过: {entry.name}")
                 continue
             
-            # 复制文件
-            shutil.copy2(src_file, dst_file)
+            # 移动或链接文件
+            transfer_file(entry.path, os.path.join(merged_path, entry.name), copy)
+            merged_names.add(entry.name)
             total_files += 1
         
-        logging.info(f"从 {folder} 合并了 {len(files)} 个文件")
+        logging.info(f"从 {folder} 合并了 {len(entries)} 个文件")
     
     logging.info(f"合并完成，总共合并了 {total_files} 个文件到 {TARGET_FOLDER}")
     
@@ -81,10 +100,15 @@ def main():
         logging.info(f"已删除的空文件夹: {', '.join(empty_folders)}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='合并同一日期的批次文件夹')
+    parser.add_argument('--copy', action='store_true',
+                        help='保留原批次文件夹中的文件（硬链接或复制），默认直接移动')
+    args = parser.parse_args()
+    
     start_time = datetime.now()
     logging.info(f"开始合并批次 - {DATE_PREFIX}")
     
-    main()
+    main(copy=args.copy)
     
     end_time = datetime.now()
     duration = (end_time - start_time).total_seconds()
@@ -7,8 +7,9 @@
 将新批次的元数据合并到主元数据文件中
 """
 
-import json
 import os
+import argparse
+from jsonio import read_json, iter_jsonl, write_images_json
 from datetime import datetime
 
 # 配置
@@ -16,47 +17,58 @@ NEW_METADATA_FILE = "metadata/metadata_20250417.json"
 MAIN_METADATA_FILE = "api/data/images.json"
 FRONTEND_DATA_FILE = "project/src/data/images.json"
 
-def merge_metadata():
-    """将新的元数据合并到主元数据文件中"""
+def iter_new_metadata(path):
+    """逐条读取新元数据
+    
+    .jsonl 文件逐行解析，不需要把整个批次读入内存；.json 文件仍整体解析
+    """
+    if path.endswith('.jsonl'):
+        yield from iter_jsonl(path)
+    else:
+        yield from read_json(path)
+
+def merge_metadata(verbose=False):
+    """将新的元数据合并到主元数据文件中
+    
+    Args:
+        verbose: 是否逐条打印新增的元数据，默认只输出汇总
+    """
     try:
-        # 读取新元数据
-        with open(NEW_METADATA_FILE, 'r', encoding='utf-8') as f:
-            new_data = json.load(f)
-        
-        print(f"新元数据文件有 {len(new_data)} 条记录")
-        
         # 读取主元数据
-        with open(MAIN_METADATA_FILE, 'r', encoding='utf-8') as f:
-            main_data = json.load(f)
+        main_data = read_json(MAIN_METADATA_FILE)
         
         print(f"主元数据文件有 {len(main_data)} 条记录")
         
-        # 备份原始元数据文件
-        backup_path = f"{MAIN_METADATA_FILE}.bak.{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        os.rename(MAIN_METADATA_FILE, backup_path)
-        print(f"已备份原始元数据文件: {backup_path}")
-        
         # 提取已有的ID集合
         existing_ids = {item['id'] for item in main_data}
         
-        # 添加新元数据（避免重复）
-        new_items_added = 0
-        for item in new_data:
+        # 添加新元数据（避免重复，新数据内部的重复ID也只保留第一条）
+        new_items_total = 0
+        to_add = []
+        for item in iter_new_metadata(NEW_METADATA_FILE):
+            new_items_total += 1
             if item['id'] not in existing_ids:
-                main_data.append(item)
                 existing_ids.add(item['id'])
-                new_items_added += 1
-                print(f"添加新元数据: {item['id']} - {item['caption']}")
+                to_add.append(item)
+        main_data.extend(to_add)
+        new_items_added = len(to_add)
+        
+        if verbose:
+            print('\n'.join(f"添加新元数据: {item['id']} - {item['caption']}" for item in to_add))
+        print(f"新元数据文件有 {new_items_total} 条记录")
+        
+        # 备份原始元数据文件
+        backup_path = f"{MAIN_METADATA_FILE}.bak.{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        os.rename(MAIN_METADATA_FILE, backup_path)
+        print(f"已备份原始元数据文件: {backup_path}")
         
         # 写入更新后的元数据
-        with open(MAIN_METADATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(main_data, f, indent=2, ensure_ascii=False)
+        write_images_json(MAIN_METADATA_FILE, main_data)
         
         # 同时更新前端数据文件
         if os.path.exists(os.path.dirname(FRONTEND_DATA_FILE)):
             os.makedirs(os.path.dirname(FRONTEND_DATA_FILE), exist_ok=True)
-            with open(FRONTEND_DATA_FILE, 'w', encoding='utf-8') as f:
-                json.dump(main_data, f, indent=2, ensure_ascii=False)
+            write_images_json(FRONTEND_DATA_FILE, main_data)
             print(f"已更新前端数据文件: {FRONTEND_DATA_FILE}")
         
         print(f"元数据合并完成！新增 {new_items_added} 条记录，当前共有 {len(main_data)} 条记录")
@@ -66,4 +78,7 @@ def merge_metadata():
         return False
 
 if __name__ == "__main__":
-    merge_metadata() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='将新批次的元数据合并到主元数据文件中')
+    parser.add_argument('--verbose', action='store_true', help='逐条打印新增的元数据')
+    args = parser.parse_args()
+    merge_metadata(verbose=args.verbose) 
\ No newline at end of file
@@ -13,32 +13,157 @@ PNG图片优化工具
 
 import os
 import sys
-import glob
-import shutil
+import errno
+import functools
+import atexit
 import logging
+import multiprocessing
 import argparse
 import subprocess
+import io
 import time
-from datetime import datetime
-from PIL import Image
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('png_optimizer.log')
-    ]
-)
+import threading
+import selectors
+import itertools
+import sqlite3
+import hashlib
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from fileio import copy_file
+
+# libimagequant的Python绑定（pip install imagequant），未安装时调用pngquant命令
+try:
+    import imagequant
+except ImportError:
+    imagequant = None
+
 logger = logging.getLogger('png_optimizer')
 
+# 命令行运行时的日志格式和日志队列，进程池中的工作进程也把日志记录放入这个队列
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+_LOG_QUEUE = None
+
+def _setup_logging():
+    """
+    配置命令行运行时的日志
+    
+    只在作为脚本运行时调用；被其他模块导入时沿用调用方的日志配置，也不会创建png_optimizer.log
+    日志记录先放入队列，由单独的线程写到终端和日志文件，压缩流程不会阻塞在日志I/O上
+    使用multiprocessing的队列，工作进程启动时由 _init_worker_logging 接入同一个队列，
+    日志由主进程统一写出
+    """
+    global _LOG_QUEUE
+    _LOG_QUEUE = multiprocessing.Queue(-1)
+    listener = QueueListener(
+        _LOG_QUEUE,
+        logging.StreamHandler(),
+        RotatingFileHandler('png_optimizer.log', maxBytes=10 * 1024 * 1024, backupCount=3,
+                            encoding='utf-8', delay=True)
+    )
+    logging.basicConfig(
+        level=logging.INFO,
+        format=LOG_FORMAT,
+        handlers=[
+            QueueHandler(_LOG_QUEUE)
+        ]
+    )
+    listener.start()
+    atexit.register(listener.stop)
+
+def _init_worker_logging(log_queue, level):
+    """
+    进程池工作进程的初始化函数，把日志记录发到主进程的日志队列
+    
+    spawn方式（macOS默认）启动的工作进程不会继承主进程的日志配置，需要重新接入队列；
+    fork方式继承的处理器在这里替换掉，避免同一条日志写出两次
+    未调用 _setup_logging（被其他模块导入）时不做处理
+    """
+    if log_queue is None:
+        return
+    handler = QueueHandler(log_queue)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+
+def _process_pool(max_workers):
+    """创建进程池，工作进程的日志接入主进程的日志队列"""
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker_logging,
+                               initargs=(_LOG_QUEUE, logging.getLogger().level))
+
+# 已优化文件的缓存，记录 (文件内容哈希, 方法, 参数) 对应的优化结果哈希
+CACHE_FILE = os.path.expanduser("~/.cache/png_optimizer/cache.sqlite")
+
+@functools.lru_cache(maxsize=None)
 def ensure_dir_exists(directory):
-    """确保目录存在，不存在则创建"""
-    if not os.path.exists(directory):
+    """确保目录存在，不存在则创建
+    
+    同一目录下的文件会重复调用，结果按目录缓存，只检查一次
+    """
+    if directory and not os.path.exists(directory):
         os.makedirs(directory, exist_ok=True)
         logger.info(f"已创建目录: {directory}")
 
+def move_file(src_file, dst_file):
+    """移动文件：同一文件系统下直接改名，跨设备时复制后删除原文件"""
+    try:
+        os.replace(src_file, dst_file)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        copy_file(src_file, dst_file)
+        os.remove(src_file)
+
+# PNG文件头的8字节签名
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+def _is_png(path):
+    """检查文件头是否为PNG签名，空文件、截断文件或扩展名不符的文件返回False"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(8) == PNG_SIGNATURE
+    except OSError:
+        return False
+
+def _has_alpha(path):
+    """
+    根据PNG头信息判断图片是否带透明度
+    
+    颜色类型带alpha通道（灰度+alpha、RGBA），或在图像数据之前有tRNS块时返回True；
+    无法判断时也返回True，保持使用--alpha
+    """
+    try:
+        with open(path, "rb") as f:
+            # 8字节签名 + IHDR块（长度4、类型4、数据13、CRC4）
+            header = f.read(33)
+            if len(header) < 33 or header[12:16] != b"IHDR":
+                return True
+            if header[25] in (4, 6):
+                return True
+            # 调色板、灰度、RGB图片的透明度保存在tRNS块中，tRNS必须出现在IDAT之前
+            while True:
+                chunk_header = f.read(8)
+                if len(chunk_header) < 8:
+                    return False
+                chunk_type = chunk_header[4:8]
+                if chunk_type == b"tRNS":
+                    return True
+                if chunk_type == b"IDAT":
+                    return False
+                f.seek(int.from_bytes(chunk_header[:4], "big") + 4, os.SEEK_CUR)
+    except OSError:
+        return True
+
+def _oxipng_options(level, alpha=True):
+    """oxipng的公共参数，不透明的图片不需要--alpha"""
+    options = [
+        "-o", str(level),   # 压缩级别
+        "--strip", "safe",  # 安全移除元数据
+    ]
+    if alpha:
+        options.append("--alpha")  # 优化alpha通道
+    return options
+
 def compress_with_oxipng(input_file, output_file=None, level=4):
     """
     使用oxipng压缩PNG文件
@@ -51,6 +176,10 @@ def compress_with_oxipng(input_file, output_file=None, level=4):
     Returns:
         bool: 是否成功压缩
     """
+    if not _is_png(input_file):
+        logger.warning(f"不是有效的PNG文件，跳过: {input_file}")
+        return False
+    
     try:
         # 如果未指定输出文件，则覆盖输入文件
         if output_file is None:
@@ -58,25 +187,23 @@ def compress_with_oxipng(input_file, output_file=None, level=4):
         
         # 检查输出目录是否存在
         ensure_dir_exists(os.path.dirname(output_file))
-            
-        # 如果输入和输出不同，先复制文件
-        if input_file != output_file:
-            shutil.copy2(input_file, output_file)
+        file_name = os.path.basename(output_file)
         
         # 使用oxipng压缩PNG
-        start_time = time.time()
-        original_size = os.path.getsize(output_file)
+        # 单个文件的耗时只在DEBUG级别输出，未启用时不计时
+        timing = logger.isEnabledFor(logging.DEBUG)
+        if timing:
+            start_time = time.perf_counter()
+        original_size = os.path.getsize(input_file)
         
-        logger.info(f"使用oxipng压缩PNG: {os.path.basename(input_file)}")
+        logger.debug(f"使用oxipng压缩PNG: {file_name}")
         
         # 构建oxipng命令
-        cmd = [
-            "oxipng",
-            "-o", str(level),  # 压缩级别
-            "--strip", "safe",  # 安全移除元数据
-            "--alpha",          # 优化alpha通道
-            output_file
-        ]
+        cmd = ["oxipng", *_oxipng_options(level, _has_alpha(input_file))]
+        # 输入和输出不同时直接用--out写到输出文件，不需要先复制
+        if input_file != output_file:
+            cmd += ["--out", output_file]
+        cmd.append(input_file)
         
         # 执行oxipng命令
         process = subprocess.Popen(
@@ -88,11 +215,15 @@ def compress_with_oxipng(input_file, output_file=None, level=4):
         
         stdout, stderr = process.communicate()
         
+        # oxipng没有写出输出文件时（例如出错），输出文件保持为原图
+        if input_file != output_file and not os.path.exists(output_file):
+            copy_file(input_file, output_file)
+        
         # 检查返回状态
         if process.returncode != 0:
             # 检查是否因为图片已经优化过
             if "already optimized" in stderr or "file already optimized" in stdout.lower() or stderr.strip() == "":
-                logger.info(f"图片已经被oxipng优化过: {os.path.basename(output_file)}")
+                logger.debug(f"图片已经被oxipng优化过: {file_name}")
                 return True
             else:
                 logger.error(f"oxipng压缩失败: {stderr}")
@@ -103,17 +234,15 @@ def compress_with_oxipng(input_file, output_file=None, level=4):
         
         # 检查是否有实际压缩效果
         if new_size >= original_size:
-            logger.info(f"oxipng无法进一步压缩图片: {os.path.basename(output_file)}")
+            logger.debug(f"oxipng无法进一步压缩图片: {file_name}")
             return True
             
         compression_ratio = (original_size - new_size) / original_size * 100
-        elapsed_time = time.time() - start_time
         
-        logger.info(f"oxipng压缩完成: {os.path.basename(output_file)}")
-        logger.info(f"  原始大小: {original_size/1024:.2f} KB")
-        logger.info(f"  压缩后大小: {new_size/1024:.2f} KB")
-        logger.info(f"  压缩比: {compression_ratio:.2f}%")
-        logger.info(f"  耗时: {elapsed_time:.2f} 秒")
+        logger.info(f"oxipng压缩完成: {file_name} "
+                    f"{original_size/1024:.2f} KB -> {new_size/1024:.2f} KB，压缩比 {compression_ratio:.2f}%")
+        if timing:
+            logger.debug(f"  耗时: {time.perf_counter() - start_time:.2f} 秒")
         
         return True
         
@@ -121,6 +250,37 @@ def compress_with_oxipng(input_file, output_file=None, level=4):
         logger.error(f"使用oxipng压缩时出错: {str(e)}")
         return False
 
+def _pngquant_quality(quality):
+    """转换质量范围从0-100到pngquant的1-100格式，返回(最低质量, 最高质量)"""
+    return max(1, int(quality * 0.8)), min(100, quality)
+
+def _quantize_in_process(input_file, min_quality, max_quality):
+    """
+    在进程内用libimagequant量化PNG，省去启动pngquant的开销
+    
+    Returns:
+        bytes: 量化后的PNG数据，失败时返回None（改用pngquant命令）
+    """
+    # PIL只在进程内量化时才需要，延迟导入，命令行启动时不加载
+    from PIL import Image
+    
+    try:
+        with Image.open(input_file) as img:
+            img = img.convert("RGBA")
+        quantized = imagequant.quantize_pil_image(
+            img,
+            dithering_level=1.0,
+            max_colors=256,
+            min_quality=min_quality,
+            max_quality=max_quality
+        )
+        buffer = io.BytesIO()
+        quantized.save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue()
+    except Exception as e:
+        logger.debug(f"libimagequant量化失败，改用pngquant命令: {str(e)}")
+        return None
+
 def compress_with_pngquant(input_file, output_file=None, quality=80):
     """
     使用pngquant压缩PNG文件
@@ -133,6 +293,10 @@ def compress_with_pngquant(input_file, output_file=None, quality=80):
     Returns:
         bool: 是否成功压缩
     """
+    if not _is_png(input_file):
+        logger.warning(f"不是有效的PNG文件，跳过: {input_file}")
+        return False
+    
     try:
         # 如果未指定输出文件，先创建临时文件
         temp_file = None
@@ -143,49 +307,66 @@ def compress_with_pngquant(input_file, output_file=None, quality=80):
             # 确保输出目录存在
             ensure_dir_exists(os.path.dirname(output_file))
         
-        start_time = time.time()
+        # 单个文件的耗时只在DEBUG级别输出，未启用时不计时
+        timing = logger.isEnabledFor(logging.DEBUG)
+        if timing:
+            start_time = time.perf_counter()
         original_size = os.path.getsize(input_file)
+        file_name = os.path.basename(output_file)
         
-        logger.info(f"使用pngquant压缩PNG: {os.path.basename(input_file)}")
+        logger.debug(f"使用pngquant压缩PNG: {file_name}")
         
-        # 转换质量范围从0-100到pngquant的1-100格式
-        min_quality = max(1, int(quality * 0.8))
-        max_quality = min(100, quality)
+        min_quality, max_quality = _pngquant_quality(quality)
         quality_str = f"{min_quality}-{max_quality}"
         
         # 准备输出文件路径
         pngquant_output = temp_file if temp_file else output_file
         
-        # 构建pngquant命令
-        cmd = [
-            "pngquant",
-            "--quality", quality_str,  # 质量设置
-            "--force",                 # 强制覆盖
-            "--skip-if-larger",        # 如果压缩后更大则保留原图
-            "--strip",                 # 移除元数据
-            "--output", pngquant_output,  # 输出文件
-            input_file                    # 输入文件
-        ]
+        data = None
+        if imagequant is not None:
+            data = _quantize_in_process(input_file, min_quality, max_quality)
         
-        # 执行pngquant命令
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True
-        )
+        if data is not None:
+            # 与pngquant的--skip-if-larger一致：结果更大时不写入，按已优化处理
+            if len(data) < original_size:
+                with open(pngquant_output, "wb") as f:
+                    f.write(data)
+                returncode, stderr = 0, ""
+            else:
+                returncode, stderr = 98, ""
+        else:
+            # 构建pngquant命令
+            cmd = [
+                "pngquant",
+                "--quality", quality_str,  # 质量设置
+                "--force",                 # 强制覆盖
+                "--skip-if-larger",        # 如果压缩后更大则保留原图
+                "--strip",                 # 移除元数据
+                "--output", pngquant_output,  # 输出文件
+                input_file                    # 输入文件
+            ]
         
-        stdout, stderr = process.communicate()
+            # 执行pngquant命令
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True
+            )
+        
+            stdout, stderr = process.communicate()
+        
+            returncode = process.returncode
         
         # 检查是否因为已经压缩过导致的"失败"
-        if process.returncode != 0:
+        if returncode != 0:
             if "already optimized" in stderr or stderr.strip() == "":
                 # 图片已经压缩过或无法进一步压缩
-                logger.info(f"图片已经压缩过或无法进一步压缩: {os.path.basename(input_file)}")
+                logger.debug(f"图片已经压缩过或无法进一步压缩: {file_name}")
                 
                 # 如果输出文件不同于输入文件，则复制原文件
                 if output_file != input_file:
-                    shutil.copy2(input_file, output_file)
+                    copy_file(input_file, output_file)
                 
                 # 清理临时文件
                 if temp_file and os.path.exists(temp_file):
@@ -203,18 +384,16 @@ def compress_with_pngquant(input_file, output_file=None, quality=80):
         
         # 如果使用临时文件，需要用临时文件替换原文件
         if temp_file:
-            shutil.move(temp_file, output_file)
+            move_file(temp_file, output_file)
         
         # 计算压缩结果
         new_size = os.path.getsize(output_file)
         compression_ratio = (original_size - new_size) / original_size * 100
-        elapsed_time = time.time() - start_time
         
-        logger.info(f"pngquant压缩完成: {os.path.basename(output_file)}")
-        logger.info(f"  原始大小: {original_size/1024:.2f} KB")
-        logger.info(f"  压缩后大小: {new_size/1024:.2f} KB")
-        logger.info(f"  压缩比: {compression_ratio:.2f}%")
-        logger.info(f"  耗时: {elapsed_time:.2f} 秒")
+        logger.info(f"pngquant压缩完成: {file_name} "
+                    f"{original_size/1024:.2f} KB -> {new_size/1024:.2f} KB，压缩比 {compression_ratio:.2f}%")
+        if timing:
+            logger.debug(f"  耗时: {time.perf_counter() - start_time:.2f} 秒")
         
         return True
         
@@ -230,6 +409,7 @@ def compress_with_both(input_file, output_file=None, quality=80, oxipng_level=2)
     使用pngquant和oxipng组合压缩PNG文件
     
     先用pngquant进行有损压缩，再用oxipng进行无损压缩
+    pngquant的输出通过管道直接交给oxipng，不产生中间临时文件
     
     Args:
         input_file: 输入PNG文件路径
@@ -240,90 +420,541 @@ def compress_with_both(input_file, output_file=None, quality=80, oxipng_level=2)
     Returns:
         bool: 是否成功压缩
     """
+    if not _is_png(input_file):
+        logger.warning(f"不是有效的PNG文件，跳过: {input_file}")
+        return False
+    
     try:
+        # 单个文件的耗时只在DEBUG级别输出，未启用时不计时
+        timing = logger.isEnabledFor(logging.DEBUG)
+        if timing:
+            start_time = time.perf_counter()
+        
         # 记录初始文件大小
-        start_time = time.time()
         original_size = os.path.getsize(input_file)
         
         # 确定最终输出文件路径
         final_output = input_file if output_file is None else output_file
+        ensure_dir_exists(os.path.dirname(final_output))
+        file_name = os.path.basename(final_output)
         
-        # 创建临时文件路径
-        temp_file = input_file + ".temp.png"
+        min_quality, max_quality = _pngquant_quality(quality)
         
-        # 第一步：使用pngquant进行有损压缩
-        pngquant_success = compress_with_pngquant(input_file, temp_file, quality)
+        # oxipng从标准输入读取，结果写到标准输出
+        oxipng_cmd = ["oxipng", *_oxipng_options(oxipng_level, _has_alpha(input_file)), "--stdout", "-"]
         
-        # 如果pngquant成功，继续使用oxipng处理
-        if pngquant_success and os.path.exists(temp_file):
-            # 第二步：使用oxipng进行无损压缩
-            oxipng_success = compress_with_oxipng(temp_file, final_output, oxipng_level)
-            
-            # 清理临时文件
-            if os.path.exists(temp_file) and temp_file != final_output:
-                os.remove(temp_file)
-            
-            if oxipng_success:
-                # 计算总压缩结果
-                new_size = os.path.getsize(final_output)
-                compression_ratio = (original_size - new_size) / original_size * 100
-                elapsed_time = time.time() - start_time
-                
-                logger.info(f"组合压缩完成: {os.path.basename(final_output)}")
-                logger.info(f"  原始大小: {original_size/1024:.2f} KB")
-                logger.info(f"  压缩后大小: {new_size/1024:.2f} KB")
-                logger.info(f"  总压缩比: {compression_ratio:.2f}%")
-                logger.info(f"  总耗时: {elapsed_time:.2f} 秒")
-                
-                return True
-            else:
-                # oxipng失败，但如果是因为图像已经优化过，仍然算成功
-                if os.path.exists(final_output):
-                    new_size = os.path.getsize(final_output)
-                    if new_size <= original_size:
-                        logger.info(f"组合压缩完成(只完成pngquant): {os.path.basename(final_output)}")
-                        return True
-                return False
-        elif pngquant_success:
-            # pngquant成功但可能因为已优化而没有生成文件，直接使用oxipng
-            oxipng_success = compress_with_oxipng(input_file, final_output, oxipng_level)
-            
-            if oxipng_success:
-                # 计算总结果
-                new_size = os.path.getsize(final_output)
-                compression_ratio = 0
-                if new_size < original_size:
-                    compression_ratio = (original_size - new_size) / original_size * 100
-                
-                elapsed_time = time.time() - start_time
-                
-                logger.info(f"组合压缩完成(只完成oxipng): {os.path.basename(final_output)}")
-                logger.info(f"  原始大小: {original_size/1024:.2f} KB")
-                logger.info(f"  压缩后大小: {new_size/1024:.2f} KB")
-                logger.info(f"  总压缩比: {compression_ratio:.2f}%")
-                logger.info(f"  总耗时: {elapsed_time:.2f} 秒")
-                
-                return True
-            else:
-                # 如果oxipng也失败，但结果文件等于或小于原始文件，仍然视为成功
-                if os.path.exists(final_output) and os.path.getsize(final_output) <= original_size:
-                    logger.info(f"图片已被充分优化，无需进一步压缩: {os.path.basename(final_output)}")
-                    return True
-                return False
+        quantized = None
+        if imagequant is not None:
+            quantized = _quantize_in_process(input_file, min_quality, max_quality)
+        
+        if quantized is not None:
+            # 进程内量化的结果直接写入oxipng的标准输入
+            oxipng = subprocess.run(oxipng_cmd, input=quantized, capture_output=True)
+            data, pngquant_returncode = oxipng.stdout, 0
         else:
-            # pngquant失败，清理临时文件
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-            return False
+            # 第一步：pngquant有损压缩，第二步：oxipng无损压缩，两者之间用管道连接
+            with open(input_file, "rb") as f:
+                pngquant = subprocess.Popen(
+                    ["pngquant", "--quality", f"{min_quality}-{max_quality}", "--strip", "-"],
+                    stdin=f,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL
+                )
+            oxipng = subprocess.Popen(
+                oxipng_cmd,
+                stdin=pngquant.stdout,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+            # 关闭本进程持有的管道读端，oxipng提前退出时pngquant能收到SIGPIPE
+            pngquant.stdout.close()
+            data, _ = oxipng.communicate()
+            pngquant_returncode = pngquant.wait()
+        
+        if pngquant_returncode != 0 or oxipng.returncode != 0 or not data:
+            # pngquant无法压缩（例如达不到质量要求）时，只用oxipng进行无损压缩
+            logger.debug(f"pngquant未能压缩，只使用oxipng: {file_name}")
+            return compress_with_oxipng(input_file, output_file, oxipng_level)
+        
+        new_size = len(data)
+        if new_size >= original_size:
+            # 组合压缩后没有变小，保留原图
+            if final_output != input_file:
+                copy_file(input_file, final_output)
+            logger.debug(f"图片已被充分优化，无需进一步压缩: {file_name}")
+            return True
+        
+        with open(final_output, "wb") as f:
+            f.write(data)
+        
+        # 计算总压缩结果
+        compression_ratio = (original_size - new_size) / original_size * 100
+        
+        logger.info(f"组合压缩完成: {file_name} "
+                    f"{original_size/1024:.2f} KB -> {new_size/1024:.2f} KB，总压缩比 {compression_ratio:.2f}%")
+        if timing:
+            logger.debug(f"  总耗时: {time.perf_counter() - start_time:.2f} 秒")
+        
+        return True
         
     except Exception as e:
         logger.error(f"组合压缩时出错: {str(e)}")
-        # 清理临时文件
-        if 'temp_file' in locals() and os.path.exists(temp_file):
-            os.remove(temp_file)
         return False
 
-def optimize_png(input_path, output_path=None, method="both", quality=80, oxipng_level=2, force=False):
+# 整批调用时每条命令行中文件路径的总字节数上限，远低于系统的ARG_MAX
+# 按长度而不是按文件数切分，通常整个目录只需要一次调用
+BULK_ARGS_BYTES = 256 * 1024
+
+# 复制文件到输出目录时的并发线程数
+COPY_WORKERS = 16
+
+# 处理目录时每次从遍历结果中取出的文件数，内存占用只与这个数有关
+STREAM_CHUNK_SIZE = 1000
+
+# 逐个处理文件时，在正在处理的文件之外最多预读的文件数
+PREFETCH_AHEAD = min(os.cpu_count() or 1, 32)
+
+def _batches(files, size=None):
+    """把文件列表切分成若干批，每批最多size个文件，且路径总长度不超过BULK_ARGS_BYTES"""
+    batch = []
+    batch_bytes = 0
+    for png_file in files:
+        file_bytes = len(os.fsencode(png_file)) + 1
+        if batch and ((size and len(batch) >= size) or batch_bytes + file_bytes > BULK_ARGS_BYTES):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(png_file)
+        batch_bytes += file_bytes
+    if batch:
+        yield batch
+
+def _run_many(cmds, concurrency):
+    """
+    同时运行多条命令，始终保持最多concurrency个子进程在运行
+    
+    通过selectors等待各子进程的标准错误输出，哪个结束就立即启动下一条命令
+    
+    Returns:
+        list: 每条命令的(返回码, 标准错误输出)，顺序与cmds一致
+    """
+    results = [None] * len(cmds)
+    pending = enumerate(cmds)
+    outputs = {}
+    selector = selectors.DefaultSelector()
+    
+    def start(index, cmd):
+        process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        outputs[index] = []
+        selector.register(process.stderr, selectors.EVENT_READ, (index, process))
+    
+    for index, cmd in itertools.islice(pending, concurrency):
+        start(index, cmd)
+    
+    while selector.get_map():
+        for key, _ in selector.select():
+            index, process = key.data
+            chunk = os.read(key.fd, 65536)
+            if chunk:
+                outputs[index].append(chunk)
+                continue
+            
+            # 标准错误输出关闭说明子进程已结束
+            selector.unregister(key.fileobj)
+            key.fileobj.close()
+            stderr = b"".join(outputs.pop(index)).decode("utf-8", errors="replace")
+            results[index] = (process.wait(), stderr)
+            
+            next_cmd = next(pending, None)
+            if next_cmd is not None:
+                start(*next_cmd)
+    
+    selector.close()
+    return results
+
+def compress_dir_with_oxipng(files, level=4):
+    """
+    使用一次oxipng调用原地压缩多个PNG文件
+    
+    oxipng会在内部并行处理命令行上的所有文件，省去每个文件单独启动进程的开销
+    
+    Args:
+        files: PNG文件路径列表
+        level: 压缩级别(0-6)，默认4
+        
+    Returns:
+        list: 压缩失败的文件路径，全部成功时为空列表
+    """
+    # 带透明度和不透明的图片分开调用，不透明的图片不需要--alpha
+    alpha_files, opaque_files = [], []
+    for png_file in files:
+        (alpha_files if _has_alpha(png_file) else opaque_files).append(png_file)
+    
+    failed = []
+    for alpha, group in ((True, alpha_files), (False, opaque_files)):
+        for batch in _batches(group):
+            cmd = ["oxipng", *_oxipng_options(level, alpha), *batch]
+            process = subprocess.run(cmd, capture_output=True, text=True)
+            if process.returncode != 0:
+                # 无法区分是哪个文件出错，整批都计为失败
+                logger.error(f"oxipng批量压缩失败: {process.stderr}")
+                failed.extend(batch)
+    logger.info(f"oxipng批量压缩完成: {len(files)} 个文件")
+    return failed
+
+def compress_dir_with_pngquant(files, quality=80, concurrency=1):
+    """
+    使用pngquant原地压缩多个PNG文件
+    
+    pngquant逐个处理命令行上的文件，把文件分成concurrency组同时运行
+    
+    Args:
+        files: PNG文件路径列表
+        quality: 输出质量(0-100)，默认80
+        concurrency: 同时运行的pngquant进程数，默认1
+        
+    Returns:
+        list: 压缩失败的文件路径，全部成功时为空列表
+    """
+    if imagequant is not None:
+        # 有libimagequant绑定时在进程内逐个量化，不启动pngquant
+        return [png_file for png_file in files if not compress_with_pngquant(png_file, None, quality)]
+    
+    min_quality, max_quality = _pngquant_quality(quality)
+    quality_str = f"{min_quality}-{max_quality}"
+    
+    batch_size = max(1, -(-len(files) // concurrency))
+    batches = list(_batches(files, batch_size))
+    cmds = [
+        [
+            "pngquant",
+            "--quality", quality_str,
+            "--force",
+            "--skip-if-larger",   # 压缩后更大则保留原图
+            "--strip",
+            "--ext", ".png",      # 覆盖原文件
+            *batch
+        ]
+        for batch in batches
+    ]
+    
+    failed = []
+    for batch, (returncode, stderr) in zip(batches, _run_many(cmds, concurrency)):
+        # 98: 压缩后更大，99: 达不到质量要求，两种情况下原文件保持不变
+        if returncode not in (0, 98, 99):
+            # 无法区分是哪个文件出错，整批都计为失败
+            logger.error(f"pngquant批量压缩失败: {stderr}")
+            failed.extend(batch)
+    logger.info(f"pngquant批量压缩完成: {len(files)} 个文件")
+    return failed
+
+def _walk_pngs(root):
+    """递归遍历目录，逐个返回PNG文件的DirEntry（与glob一样跳过隐藏文件和目录）"""
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk_pngs(entry.path)
+            elif entry.name.endswith(".png"):
+                yield entry
+
+def _fadvise(path, advice):
+    """向内核提示文件接下来的访问方式（预读或释放页缓存），失败时忽略"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, advice)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+def _start_prefetch(files, slots):
+    """
+    启动后台线程，按顺序让内核预读文件
+    
+    每预读一个文件占用slots的一个名额，已处理完的文件归还名额，预读不会超前太多
+    """
+    def prefetch():
+        for path in files:
+            slots.acquire()
+            _fadvise(path, os.POSIX_FADV_WILLNEED)
+    
+    thread = threading.Thread(target=prefetch, daemon=True)
+    thread.start()
+    return thread
+
+def _compress(input_file, output_file, method, quality, oxipng_level):
+    """根据指定方法压缩单个PNG文件"""
+    if method == "oxipng":
+        return compress_with_oxipng(input_file, output_file, oxipng_level)
+    elif method == "pngquant":
+        return compress_with_pngquant(input_file, output_file, quality)
+    else:  # method == "both" 或其他值
+        return compress_with_both(input_file, output_file, quality, oxipng_level)
+
+def _process_one(png_file, original_size, input_path, output_path, method, quality, oxipng_level):
+    """
+    处理目录中的单个PNG文件，在工作进程中执行
+    
+    Args:
+        png_file: PNG文件路径
+        original_size: 遍历目录时已经取得的原始文件大小
+    
+    Returns:
+        tuple: (是否成功, 原始大小, 压缩后大小)
+    """
+    # 确定输出文件路径
+    if output_path:
+        # 获取相对路径，用于构建输出路径
+        rel_path = os.path.relpath(png_file, input_path)
+        file_output_path = os.path.join(output_path, rel_path)
+        
+        # 确保输出目录存在
+        ensure_dir_exists(os.path.dirname(file_output_path))
+    else:
+        file_output_path = None  # 覆盖原文件
+    
+    success = _compress(png_file, file_output_path, method, quality, oxipng_level)
+    
+    # 获取处理后的文件大小
+    new_file_path = file_output_path or png_file
+    new_size = os.path.getsize(new_file_path) if os.path.exists(new_file_path) else original_size
+    
+    return success, original_size, new_size
+
+def _file_hash(path):
+    """计算文件内容的sha256"""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _output_file(png_file, input_path, output_path):
+    """目录中的文件对应的输出文件路径，未指定输出目录时为原文件"""
+    if output_path:
+        return os.path.join(output_path, os.path.relpath(png_file, input_path))
+    return png_file
+
+def _open_cache():
+    """打开（必要时创建）优化缓存数据库"""
+    ensure_dir_exists(os.path.dirname(CACHE_FILE))
+    cache = sqlite3.connect(CACHE_FILE)
+    cache.execute(
+        "CREATE TABLE IF NOT EXISTS optimized ("
+        "hash TEXT, method TEXT, params TEXT, result_hash TEXT, "
+        "PRIMARY KEY (hash, method, params))"
+    )
+    return cache
+
+def _cache_lookup(cache, file_hash, method, params):
+    """查询缓存，返回优化结果的哈希，未命中时返回None"""
+    row = cache.execute(
+        "SELECT result_hash FROM optimized WHERE hash = ? AND method = ? AND params = ?",
+        (file_hash, method, params)
+    ).fetchone()
+    return row[0] if row else None
+
+def _skip_cached(cache, png_files, input_path, output_path, method, params):
+    """
+    跳过内容和参数都没有变化、输出文件已经是优化结果的文件
+    
+    Args:
+        png_files: 文件路径到原始大小的字典
+    
+    Returns:
+        tuple: (需要处理的文件及其内容哈希, 命中缓存的文件的处理结果列表)
+    """
+    pending = {}
+    hits = []
+    for png_file, original_size in png_files.items():
+        file_hash = _file_hash(png_file)
+        result_hash = _cache_lookup(cache, file_hash, method, params)
+        target = _output_file(png_file, input_path, output_path)
+        if result_hash is not None and os.path.exists(target):
+            target_hash = file_hash if target == png_file else _file_hash(target)
+            if target_hash == result_hash:
+                # 缓存命中，不再压缩，计为跳过
+                hits.append((png_file, False, original_size, os.path.getsize(target)))
+                continue
+        pending[png_file] = file_hash
+    
+    if hits:
+        logger.info(f"缓存命中 {len(hits)} 个文件，已跳过")
+    return pending, hits
+
+def _update_cache(cache, file_hashes, input_path, output_path, method, params):
+    """记录压缩成功的文件，优化结果本身也记为已优化"""
+    rows = []
+    for png_file, file_hash in file_hashes.items():
+        target = _output_file(png_file, input_path, output_path)
+        if not os.path.exists(target):
+            continue
+        result_hash = _file_hash(target)
+        rows.append((file_hash, method, params, result_hash))
+        rows.append((result_hash, method, params, result_hash))
+    cache.executemany("INSERT OR REPLACE INTO optimized VALUES (?, ?, ?, ?)", rows)
+    cache.commit()
+
+def _record_result(results, success, original_size, new_size):
+    """把单个文件的处理结果计入统计"""
+    results["total_original_size"] += original_size
+    # 成功且有实际压缩效果的计为已处理，其余（包括失败）计为跳过，失败的另外单独计数
+    if success and new_size < original_size:
+        results["processed_files"] += 1
+    else:
+        results["skipped_files"] += 1
+        if not success:
+            results["failed_files"] += 1
+    # 处理失败时文件仍然存在，同样记录其大小
+    results["total_new_size"] += new_size
+
+def _optimize_dir_bulk(png_files, input_path, output_path, method, quality, oxipng_level, jobs=None):
+    """
+    整批压缩目录中的PNG文件，每个工具只启动少数几次，而不是每个文件一次
+    
+    指定输出目录时先把文件复制到输出目录，再原地压缩输出文件
+    
+    Args:
+        png_files: 文件路径到原始大小的字典
+    
+    Returns:
+        list: 每个文件的处理结果 (文件路径, 是否成功, 原始大小, 压缩后大小)
+    """
+    if output_path:
+        targets = [_output_file(png_file, input_path, output_path) for png_file in png_files]
+        # 每个输出目录只创建一次
+        for directory in {os.path.dirname(target) for target in targets}:
+            ensure_dir_exists(directory)
+        # 复制是阻塞的系统调用，交给线程池批量并发执行
+        with ThreadPoolExecutor(max_workers=COPY_WORKERS) as executor:
+            list(executor.map(copy_file, png_files, targets))
+    else:
+        targets = list(png_files)
+    
+    failed = set()
+    if targets:
+        # 先用pngquant有损压缩
+        if method != "oxipng":
+            workers = jobs or os.cpu_count()
+            if imagequant is not None:
+                # 进程内量化占用CPU，把文件分组交给多个进程
+                groups = [group for group in (targets[i::workers] for i in range(workers)) if group]
+                with _process_pool(len(groups)) as executor:
+                    for group_failed in executor.map(compress_dir_with_pngquant, groups, [quality] * len(groups)):
+                        failed.update(group_failed)
+            else:
+                failed.update(compress_dir_with_pngquant(targets, quality, workers))
+        
+        # 再用oxipng无损压缩全部文件
+        failed.update(compress_dir_with_oxipng(targets, oxipng_level))
+    
+    file_results = []
+    for (png_file, original_size), target in zip(png_files.items(), targets):
+        new_size = os.path.getsize(target) if os.path.exists(target) else original_size
+        file_results.append((png_file, target not in failed, original_size, new_size))
+    
+    return file_results
+
+def _iter_process_pool(executor, workers, png_files, input_path, output_path, method, quality, oxipng_level):
+    """
+    把文件逐个交给进程池压缩，按完成顺序返回每个文件的处理结果
+    
+    Yields:
+        tuple: (文件路径, 是否成功, 原始大小, 压缩后大小)
+    """
+    # 后台线程按提交顺序预读后面的文件，每完成一个文件再往后预读一个
+    prefetch_slots = threading.Semaphore(workers + PREFETCH_AHEAD)
+    if hasattr(os, "posix_fadvise"):
+        _start_prefetch(list(png_files), prefetch_slots)
+    
+    futures = {
+        executor.submit(_process_one, png_file, original_size, input_path, output_path,
+                        method, quality, oxipng_level): png_file
+        for png_file, original_size in png_files.items()
+    }
+    
+    # 按完成顺序返回结果
+    for future in as_completed(futures):
+        png_file = futures[future]
+        success, original_size, new_size = future.result()
+        
+        prefetch_slots.release()
+        # 输出到其他目录时原文件不会再被读取，释放其页缓存
+        if output_path and hasattr(os, "posix_fadvise"):
+            _fadvise(png_file, os.POSIX_FADV_DONTNEED)
+        
+        yield png_file, success, original_size, new_size
+
+def _iter_valid_pngs(root):
+    """遍历目录，逐个返回有效PNG文件的路径和大小，遍历时取得的stat结果直接复用"""
+    for entry in _walk_pngs(root):
+        # 先检查文件头，不是PNG的文件（空文件、截断文件等）不交给压缩工具
+        if not _is_png(entry.path):
+            logger.warning(f"不是有效的PNG文件，跳过: {entry.path}")
+            continue
+        yield entry.path, entry.stat().st_size
+
+def iter_optimize_dir(input_path, output_path=None, method="both", quality=80, oxipng_level=2,
+                      force=False, jobs=None, no_cache=False):
+    """
+    优化目录中的PNG图片，逐个返回每个文件的处理结果
+    
+    边遍历边处理，每次只取STREAM_CHUNK_SIZE个文件，内存占用与目录大小无关
+    参数含义同optimize_png
+    
+    Yields:
+        tuple: (文件路径, 是否成功, 原始大小, 压缩后大小)
+    """
+    workers = jobs or os.cpu_count()
+    
+    # 查询缓存，force时仍然全部重新压缩，但会更新缓存
+    cache = None if no_cache else _open_cache()
+    cache_params = f"quality={quality},oxipng_level={oxipng_level}"
+    
+    # 逐个处理时整个目录共用一个进程池
+    executor = _process_pool(workers) if method == "pngquant" else None
+    
+    try:
+        files = _iter_valid_pngs(input_path)
+        while True:
+            png_files = dict(itertools.islice(files, STREAM_CHUNK_SIZE))
+            if not png_files:
+                break
+            
+            if cache is not None and not force:
+                file_hashes, hits = _skip_cached(cache, png_files, input_path, output_path,
+                                                 method, cache_params)
+                yield from hits
+                png_files = {png_file: png_files[png_file] for png_file in file_hashes}
+            elif cache is not None:
+                file_hashes = {png_file: _file_hash(png_file) for png_file in png_files}
+            
+            if executor is None:
+                # oxipng和组合压缩直接整批调用命令行工具
+                # 只有压缩成功的文件才写入缓存
+                file_results = _optimize_dir_bulk(png_files, input_path, output_path,
+                                                  method, quality, oxipng_level, jobs)
+                succeeded = [file_result[0] for file_result in file_results if file_result[1]]
+                yield from file_results
+            else:
+                # 每个文件的压缩都是独立的子进程调用，分到多个进程并行处理
+                succeeded = []
+                for file_result in _iter_process_pool(executor, workers, png_files, input_path,
+                                                      output_path, method, quality, oxipng_level):
+                    if file_result[1]:
+                        succeeded.append(file_result[0])
+                    yield file_result
+            
+            if cache is not None:
+                _update_cache(cache, {f: file_hashes[f] for f in succeeded},
+                              input_path, output_path, method, cache_params)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if cache is not None:
+            cache.close()
+
+def optimize_png(input_path, output_path=None, method="both", quality=80, oxipng_level=2, force=False, jobs=None, no_cache=False):
     """
     优化PNG图片
     
@@ -333,134 +964,75 @@ def optimize_png(input_path, output_path=None, method="both", quality=80, oxipng
         method: 压缩方法，可选值为"oxipng"、"pngquant"或"both"，默认为"both"
         quality: pngquant质量(0-100)，默认80
         oxipng_level: oxipng压缩级别(0-6)，默认2
-        force: 是否强制处理所有文件，即使已经被优化过，默认False
+        force: 是否强制处理所有文件，即使已经被优化过（忽略缓存），默认False
+        jobs: 处理目录时的并行进程数，默认为None（使用CPU核心数）
+        no_cache: 处理目录时不使用已优化文件的缓存，默认False
         
     Returns:
         dict: 压缩结果统计
     """
-    # 初始化结果统计
+    # 初始化结果统计，只保存计数，不保存文件列表
     results = {
         "total_files": 0,
         "processed_files": 0,
         "skipped_files": 0,
+        "failed_files": 0,
         "total_original_size": 0,
         "total_new_size": 0,
         "compression_ratio": 0,
         "start_time": time.time()
     }
+    # 耗时用单调时钟计算，不受系统时间调整影响
+    start_counter = time.perf_counter()
     
     # 处理目录
     if os.path.isdir(input_path):
-        # 获取所有PNG文件
-        png_files = glob.glob(os.path.join(input_path, "**", "*.png"), recursive=True)
-        
-        # 统计总文件数
-        results["total_files"] = len(png_files)
-        
-        logger.info(f"找到 {len(png_files)} 个PNG文件需要优化")
+        logger.info(f"开始优化目录中的PNG文件: {input_path}")
         
-        # 对每个文件进行处理
-        for png_file in png_files:
-            # 确定输出文件路径
-            if output_path:
-                # 获取相对路径，用于构建输出路径
-                rel_path = os.path.relpath(png_file, input_path)
-                file_output_path = os.path.join(output_path, rel_path)
-                
-                # 确保输出目录存在
-                ensure_dir_exists(os.path.dirname(file_output_path))
-            else:
-                file_output_path = None  # 覆盖原文件
-            
-            # 记录原始文件大小
-            original_size = os.path.getsize(png_file)
-            results["total_original_size"] += original_size
-            
-            # 根据指定方法进行压缩
-            success = False
-            if method == "oxipng":
-                success = compress_with_oxipng(png_file, file_output_path, oxipng_level)
-            elif method == "pngquant":
-                success = compress_with_pngquant(png_file, file_output_path, quality)
-            else:  # method == "both" 或其他值
-                success = compress_with_both(png_file, file_output_path, quality, oxipng_level)
-            
-            # 获取处理后的文件大小
-            new_file_path = file_output_path or png_file
-            new_size = os.path.getsize(new_file_path) if os.path.exists(new_file_path) else original_size
-            
-            # 更新处理结果
-            if success:
-                # 检查是否有实际压缩效果
-                if new_size < original_size:
-                    results["processed_files"] += 1
-                else:
-                    results["skipped_files"] += 1
-                
-                # 记录压缩后大小
-                results["total_new_size"] += new_size
-            else:
-                # 处理失败，但如果文件仍然存在，记录其大小
-                results["skipped_files"] += 1
-                results["total_new_size"] += new_size
+        for _, success, original_size, new_size in iter_optimize_dir(
+                input_path, output_path, method, quality, oxipng_level, force, jobs, no_cache):
+            _record_result(results, success, original_size, new_size)
             
             # 打印进度
-            print(f"进度: {results['processed_files'] + results['skipped_files']}/{results['total_files']} "
-                  f"({(results['processed_files'] + results['skipped_files'])/results['total_files']*100:.1f}%)", 
-                  end="\r")
+            done = results['processed_files'] + results['skipped_files']
+            print(f"进度: 已完成 {done} 个文件", end="\r")
         
         print()  # 换行
     
     # 处理单个文件
     elif os.path.isfile(input_path) and input_path.lower().endswith(".png"):
-        results["total_files"] = 1
-        
         # 记录原始文件大小
         original_size = os.path.getsize(input_path)
-        results["total_original_size"] = original_size
         
         # 根据指定方法进行压缩
-        success = False
-        if method == "oxipng":
-            success = compress_with_oxipng(input_path, output_path, oxipng_level)
-        elif method == "pngquant":
-            success = compress_with_pngquant(input_path, output_path, quality)
-        else:  # method == "both" 或其他值
-            success = compress_with_both(input_path, output_path, quality, oxipng_level)
+        success = _compress(input_path, output_path, method, quality, oxipng_level)
         
         # 获取处理后的文件大小
         new_file_path = output_path or input_path
         new_size = os.path.getsize(new_file_path) if os.path.exists(new_file_path) else original_size
         
-        # 更新处理结果
-        if success:
-            # 检查是否有实际压缩效果
-            if new_size < original_size:
-                results["processed_files"] = 1
-            else:
-                results["skipped_files"] = 1
-            
-            results["total_new_size"] = new_size
-        else:
-            # 处理失败，但如果文件仍然存在，记录其大小
-            results["skipped_files"] = 1
-            results["total_new_size"] = new_size
+        _record_result(results, success, original_size, new_size)
     
     else:
         logger.error(f"输入路径无效或非PNG文件: {input_path}")
         return results
     
+    # 总文件数由处理和跳过的文件数得出
+    results["total_files"] = results["processed_files"] + results["skipped_files"]
+    
     # 计算总压缩比
     if results["total_original_size"] > 0 and results["total_new_size"] > 0:
         results["compression_ratio"] = (results["total_original_size"] - results["total_new_size"]) / results["total_original_size"] * 100
     
     # 计算总耗时
-    results["elapsed_time"] = time.time() - results["start_time"]
+    results["elapsed_time"] = time.perf_counter() - start_counter
     
     # 打印总结
     logger.info(f"\n压缩结果统计:")
     logger.info(f"  处理文件数: {results['processed_files']}/{results['total_files']}")
     logger.info(f"  跳过文件数: {results['skipped_files']}/{results['total_files']}")
+    if results['failed_files']:
+        logger.warning(f"  其中压缩失败: {results['failed_files']} 个文件")
     logger.info(f"  原始总大小: {results['total_original_size']/1024/1024:.2f} MB")
     logger.info(f"  压缩后总大小: {results['total_new_size']/1024/1024:.2f} MB")
     logger.info(f"  总压缩比: {results['compression_ratio']:.2f}%")
@@ -468,8 +1040,9 @@ def optimize_png(input_path, output_path=None, method="both", quality=80, oxipng
     
     return results
 
-def main():
-    """主函数"""
+@functools.lru_cache(maxsize=None)
+def _build_parser():
+    """构建命令行参数解析器，只在第一次使用时构建"""
     parser = argparse.ArgumentParser(description='PNG图片优化工具')
     parser.add_argument('input', help='输入PNG文件或目录路径')
     parser.add_argument('--output', help='输出PNG文件或目录路径')
@@ -478,11 +1051,17 @@ def main():
     parser.add_argument('--quality', type=int, default=80, help='pngquant质量(0-100)，默认80')
     parser.add_argument('--oxipng-level', type=int, default=2, help='oxipng压缩级别(0-6)，默认2')
     parser.add_argument('--force', action='store_true', help='强制处理所有文件，即使已优化过')
-    
-    args = parser.parse_args()
+    parser.add_argument('--no-cache', action='store_true', help='不使用已优化文件的缓存')
+    parser.add_argument('--jobs', type=int, default=None, help='并行进程数，默认为CPU核心数')
+    return parser
+
+def main(argv=None):
+    """主函数"""
+    args = _build_parser().parse_args(argv)
     
     # 调用优化函数
-    optimize_png(args.input, args.output, args.method, args.quality, args.oxipng_level, args.force)
+    optimize_png(args.input, args.output, args.method, args.quality, args.oxipng_level, args.force, args.jobs, args.no_cache)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    _setup_logging()
+    sys.exit(main()) 
\ No newline at end of file
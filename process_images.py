@@ -14,26 +14,35 @@
     批次处理:
     python3 process_images.py --batch YYYYMMDD
     
+    GPU推理（CUDA需要安装 onnxruntime-gpu）:
+    python3 process_images.py --batch YYYYMMDD --device cuda
+    
     验收管理:
     python3 process_images.py --merge [源目录] [目标目录]
     默认将处理后的图片合并到 project/public/images
 """
 
 import os
+import math
 import glob
 import numpy as np
-import shutil
 import argparse
-import json
-from PIL import Image
+from jsonio import BUFFER_SIZE, dumps_json, read_json, recover_jsonl, write_json
+from fileio import copy_file, link_or_copy
+import functools
+import itertools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from PIL import Image, ImageOps, __version__ as PIL_VERSION
+import onnxruntime as ort
 from rembg import remove
+from rembg.sessions import sessions_class
 import sys
 import time
 from datetime import datetime
 
 # 导入现有的描边生成函数
 sys.path.append(os.path.abspath('api/processors'))
-from test_smooth_no_gap_outline import create_smooth_no_gap_outline
+from test_smooth_no_gap_outline import create_smooth_no_gap_outline, create_smooth_no_gap_outline_pil
 
 # 定义常量
 UNSPLASH_IMAGES_DIR = "unsplash-images"
@@ -42,6 +51,49 @@ TEMP_RESULTS_DIR = "temp-results"
 PROJECT_IMAGES_DIR = "project/public/images"
 METADATA_DIR = "metadata"
 PROCESSED_RECORD_FILE = os.path.join(METADATA_DIR, "processed_images.json")
+# 处理过程中每完成一张图片向该文件追加一行记录，结束时合并进 PROCESSED_RECORD_FILE
+PROCESSED_LOG_FILE = os.path.join(METADATA_DIR, "processed_images.ndjson")
+# 合并图片时并行链接/复制文件的线程数
+MERGE_WORKERS = 16
+REMBG_MODEL = "u2net"
+
+# 各推理设备对应的onnxruntime执行提供者，按优先级排列，不可用时回退到CPU
+DEVICE_PROVIDERS = {
+    "cpu": ["CPUExecutionProvider"],
+    "cuda": ["CUDAExecutionProvider", "CPUExecutionProvider"],
+    "coreml": ["CoreMLExecutionProvider", "CPUExecutionProvider"],
+}
+
+# U2Net输入预处理参数（与rembg的U2netSession一致）
+U2NET_MEAN = (0.485, 0.456, 0.406)
+U2NET_STD = (0.229, 0.224, 0.225)
+U2NET_SIZE = (320, 320)
+
+# PNG保存参数：抠图后的临时透明PNG马上会被重新读取，不压缩直接存储；
+# 裁剪结果会复制到输出目录作为最终文件，保持zlib默认的压缩级别
+TEMP_PNG_SAVE_KWARGS = dict(format="PNG", compress_level=0)
+FINAL_PNG_SAVE_KWARGS = dict(format="PNG", compress_level=6, optimize=False)
+
+# 各设备每次送入模型推理的图片数量
+REMBG_BATCH_SIZE = {"cpu": 8, "cuda": 32, "coreml": 8}
+
+# rembg会话（加载好的ONNX模型），每个进程只创建一次
+_SESSION = None
+
+def _get_session(device="cpu", threads=0):
+    """获取当前进程的rembg会话，首次调用时在指定设备上加载模型
+    
+    threads 为onnxruntime单次推理使用的线程数，0表示使用全部CPU核心。
+    rembg的 new_session 不接受自定义的 SessionOptions，这里直接创建会话类
+    """
+    global _SESSION
+    if _SESSION is None:
+        sess_opts = ort.SessionOptions()
+        sess_opts.intra_op_num_threads = threads
+        sess_opts.inter_op_num_threads = 1
+        session_class = next(sc for sc in sessions_class if sc.name() == REMBG_MODEL)
+        _SESSION = session_class(REMBG_MODEL, sess_opts, providers=DEVICE_PROVIDERS[device])
+    return _SESSION
 
 def ensure_dir_exists(directory):
     """确保目录存在，不存在则创建"""
@@ -54,21 +106,27 @@ def get_current_date():
     return datetime.now().strftime('%Y%m%d')
 
 def load_processed_records():
-    """加载已处理图片记录"""
+    """加载已处理图片记录，包括上次运行中断时追加日志里尚未合并的记录"""
     ensure_dir_exists(METADATA_DIR)
+    records = {"processed_images": {}}
     if os.path.exists(PROCESSED_RECORD_FILE):
-        with open(PROCESSED_RECORD_FILE, 'r', encoding='utf-8') as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                print(f"警告: 处理记录文件格式错误，将创建新记录")
-                return {"processed_images": {}}
-    return {"processed_images": {}}
+        try:
+            records = read_json(PROCESSED_RECORD_FILE)
+        except ValueError:
+            print(f"警告: 处理记录文件格式错误，将创建新记录")
+    if os.path.exists(PROCESSED_LOG_FILE):
+        # 中断时最后一行可能只写了一半，恢复时截掉，之后继续在完整的行后追加
+        for entry in recover_jsonl(PROCESSED_LOG_FILE):
+            records["processed_images"].update(entry)
+    return records
 
 def save_processed_records(records):
-    """保存已处理图片记录"""
-    with open(PROCESSED_RECORD_FILE, 'w', encoding='utf-8') as f:
-        json.dump(records, f, indent=2, ensure_ascii=False)
+    """保存已处理图片记录（先写临时文件再原子替换），并清空已合并的追加日志"""
+    tmp_file = PROCESSED_RECORD_FILE + ".tmp"
+    write_json(tmp_file, records)
+    os.replace(tmp_file, PROCESSED_RECORD_FILE)
+    if os.path.exists(PROCESSED_LOG_FILE):
+        os.remove(PROCESSED_LOG_FILE)
 
 def remove_background(input_path, output_path):
     """使用rembg移除图片背景，将结果保存为透明PNG"""
@@ -79,16 +137,101 @@ def remove_background(input_path, output_path):
         
         # 移除背景
         print("正在移除背景...")
-        output_img = remove(input_img)
+        output_img = remove(input_img, session=_get_session())
         
         # 保存为透明PNG
-        output_img.save(output_path)
+        output_img.save(output_path, **TEMP_PNG_SAVE_KWARGS)
         print(f"透明图片已保存: {output_path}")
         return True
     except Exception as e:
         print(f"处理图片失败 {input_path}: {e}")
         return False
 
+def _predict_masks(session, images):
+    """把多张图片堆叠成一个批次做一次前向推理，返回每张图片对应的蒙版"""
+    inner = session.inner_session
+    input_name = inner.get_inputs()[0].name
+    feeds = [session.normalize(img, U2NET_MEAN, U2NET_STD, U2NET_SIZE)[input_name] for img in images]
+    try:
+        preds = inner.run(None, {input_name: np.concatenate(feeds)})[0]
+    except Exception:
+        # 模型的批次维度固定为1时，退回逐张推理
+        preds = np.concatenate([inner.run(None, {input_name: feed})[0] for feed in feeds])
+    
+    masks = []
+    for img, pred in zip(images, preds[:, 0, :, :]):
+        # 与rembg相同，按每张图片自身的取值范围归一化
+        pred = (pred - pred.min()) / (pred.max() - pred.min())
+        mask = Image.fromarray((pred * 255).astype("uint8"), mode="L")
+        masks.append(mask.resize(img.size, Image.LANCZOS))
+    return masks
+
+def _cutout_images(input_paths):
+    """批量移除背景，一次推理处理多张图片，返回透明图片列表"""
+    images = [ImageOps.exif_transpose(Image.open(path)).convert("RGBA") for path in input_paths]
+    masks = _predict_masks(_get_session(), images)
+    return [Image.composite(img, Image.new("RGBA", img.size, 0), mask) for img, mask in zip(images, masks)]
+
+def remove_backgrounds(input_paths, output_paths):
+    """批量移除背景，一次推理处理多张图片，结果分别保存为透明PNG"""
+    try:
+        print(f"正在批量移除背景: {len(input_paths)} 张图片")
+        for cutout, output_path in zip(_cutout_images(input_paths), output_paths):
+            cutout.save(output_path, **TEMP_PNG_SAVE_KWARGS)
+            print(f"透明图片已保存: {output_path}")
+        return True
+    except Exception as e:
+        print(f"批量移除背景失败: {e}")
+        return False
+
+def crop_to_center_pil(img, target_ratio=0.5, safety_padding=0.15):
+    """
+    裁剪透明图片使主体位于中心，返回裁剪后的正方形新图片
+    图片不是RGBA模式或没有可见内容时返回None
+    """
+    # 确保图片是RGBA模式
+    if img.mode != 'RGBA':
+        print(f"图片不是透明PNG，跳过裁剪")
+        return None
+    
+    # 由PIL在C层扫描alpha通道，得到非透明像素(alpha > 0)的边界框
+    bbox = img.getchannel('A').getbbox()
+    
+    # 如果没有非透明像素，不裁剪
+    if bbox is None:
+        print(f"图片中没有可见内容，跳过裁剪")
+        return None
+    
+    # getbbox 的右、下边界不包含在内
+    x_min, y_min, x_max, y_max = bbox[0], bbox[1], bbox[2] - 1, bbox[3] - 1
+    
+    # 计算主体区域的中心点
+    center_y = (y_min + y_max) // 2
+    center_x = (x_min + x_max) // 2
+    
+    # 计算主体的宽度和高度
+    subject_width = x_max - x_min + 1
+    subject_height = y_max - y_min + 1
+    
+    # 增加安全边距，确保不会裁剪到主体
+    # 输出是正方形，取宽高中的较大者加上safety_padding比例作为基准
+    max_side = max(subject_width, subject_height) * (1 + safety_padding)
+    
+    # 计算需要的边长，使主体占据图片的target_ratio
+    side_length = int(max_side / math.sqrt(target_ratio))
+    
+    # 确保边长是偶数
+    side_length = side_length + (side_length % 2)
+    
+    # 计算裁剪区域，以主体中心为中心
+    # 裁剪框允许超出图像边界，PIL会把超出部分填充为透明像素，
+    # 因此结果总是正方形，且完整包含主体
+    left = center_x - side_length // 2
+    upper = center_y - side_length // 2
+    
+    # 裁剪图片
+    return img.crop((left, upper, left + side_length, upper + side_length))
+
 def crop_to_center_main_subject(input_path, output_path, target_ratio=0.5, safety_padding=0.15):
     """
     裁剪图片使主体位于中心，并且占据图片面积的约50%
@@ -106,248 +249,292 @@ def crop_to_center_main_subject(input_path, output_path, target_ratio=0.5, safet
         # 读取透明PNG图片
         img = Image.open(input_path)
         
-        # 确保图片是RGBA模式
-        if img.mode != 'RGBA':
-            print(f"图片不是透明PNG，跳过裁剪")
-            img.save(output_path)
+        cropped_img = crop_to_center_pil(img, target_ratio, safety_padding)
+        if cropped_img is None:
+            img.save(output_path, **FINAL_PNG_SAVE_KWARGS)
             return False
         
-        # 转换为numpy数组处理
-        img_array = np.array(img)
-        
-        # 获取alpha通道
-        alpha_channel = img_array[:, :, 3]
-        
-        # 找到所有非透明像素(alpha > 0)
-        non_transparent_mask = alpha_channel > 0
-        
-        # 如果没有非透明像素，保存原图并返回
-        if not np.any(non_transparent_mask):
-            print(f"图片中没有可见内容，跳过裁剪")
-            img.save(output_path)
-            return False
-        
-        # 找到非透明区域的边界框
-        rows = np.any(non_transparent_mask, axis=1)
-        cols = np.any(non_transparent_mask, axis=0)
-        
-        # 获取非零行列的索引
-        y_min, y_max = np.where(rows)[0][[0, -1]]
-        x_min, x_max = np.where(cols)[0][[0, -1]]
-        
-        # 计算主体区域的中心点
-        center_y = (y_min + y_max) // 2
-        center_x = (x_min + x_max) // 2
-        
-        # 计算主体的宽度和高度
-        subject_width = x_max - x_min + 1
-        subject_height = y_max - y_min + 1
-        
-        # 增加安全边距，确保不会裁剪到主体
-        # 用于计算的主体尺寸增加safety_padding比例
-        padded_width = subject_width * (1 + safety_padding)
-        padded_height = subject_height * (1 + safety_padding)
-        
-        # 计算主体的面积（使用带安全边距的尺寸）
-        padded_subject_area = padded_width * padded_height
-        
-        # 计算需要的总面积(使主体占比为target_ratio)
-        required_area = padded_subject_area / target_ratio
-        
-        # 计算新的边长(输出是正方形)
-        # 取宽高中的较大者作为基准
-        max_side = max(padded_width, padded_height)
-        
-        # 计算需要的边长，使主体占据图片的target_ratio
-        side_length = int(max_side / np.sqrt(target_ratio))
-        
-        # 确保边长是偶数
-        side_length = side_length + (side_length % 2)
-        
-        # 计算裁剪区域，以主体中心为中心
-        left = max(0, center_x - side_length // 2)
-        upper = max(0, center_y - side_length // 2)
-        right = min(img.width, left + side_length)
-        lower = min(img.height, upper + side_length)
-        
-        # 当裁剪框超出图像边界时的智能调整
-        # 如果右边界超出图像尺寸，向左移动裁剪框
-        if right > img.width:
-            shift = right - img.width
-            right = img.width
-            left = max(0, left - shift)
-        
-        # 如果下边界超出图像尺寸，向上移动裁剪框
-        if lower > img.height:
-            shift = lower - img.height
-            lower = img.height
-            upper = max(0, upper - shift)
-        
-        # 确保裁剪区域足够大，如果由于图像尺寸限制导致裁剪区域变小，
-        # 则需要适当调整，使主体仍然位于中心
-        if right - left < side_length and left > 0:
-            # 如果左边有空间，向左扩展
-            left = max(0, left - (side_length - (right - left)))
-        if lower - upper < side_length and upper > 0:
-            # 如果上边有空间，向上扩展
-            upper = max(0, upper - (side_length - (lower - upper)))
-        
-        # 再次检查裁剪区域是否包含了整个主体（包括安全边距）
-        # 如果主体边界被裁剪，则调整裁剪框
-        if left > x_min or right < x_max or upper > y_min or lower < y_max:
-            # 确保裁剪框至少包含主体
-            left = min(left, x_min)
-            upper = min(upper, y_min)
-            right = max(right, x_max)
-            lower = max(lower, y_max)
-            
-            # 调整宽高以保持正方形
-            width = right - left
-            height = lower - upper
-            
-            if width > height:
-                # 高度不足，需要增加
-                diff = width - height
-                upper = max(0, upper - diff // 2)
-                lower = min(img.height, lower + diff // 2)
-                
-                # 如果仍然无法保持正方形（因为边界问题），调整宽度
-                if lower - upper < width:
-                    diff = width - (lower - upper)
-                    if left >= diff // 2:
-                        left -= diff // 2
-                        right -= diff // 2
-                    else:
-                        right -= diff
-            elif height > width:
-                # 宽度不足，需要增加
-                diff = height - width
-                left = max(0, left - diff // 2)
-                right = min(img.width, right + diff // 2)
-                
-                # 如果仍然无法保持正方形（因为边界问题），调整高度
-                if right - left < height:
-                    diff = height - (right - left)
-                    if upper >= diff // 2:
-                        upper -= diff // 2
-                        lower -= diff // 2
-                    else:
-                        lower -= diff
-        
-        # 裁剪图片
-        cropped_img = img.crop((left, upper, right, lower))
-        
         # 保存裁剪后的图片
-        cropped_img.save(output_path)
+        cropped_img.save(output_path, **FINAL_PNG_SAVE_KWARGS)
         print(f"裁剪后的图片已保存: {output_path}")
         return True
     except Exception as e:
         print(f"裁剪图片失败 {input_path}: {e}")
         return False
 
-def process_image(jpg_file, output_dir, temp_dir, outline_size=40, edge_buffer=3, target_ratio=0.5, safety_padding=0.15):
-    """处理单个JPG图片：抠图 -> 裁剪 -> 加白边"""
+def _image_paths(jpg_file, output_dir, temp_dir):
+    """返回图片的文件名（不含扩展名）以及临时透明PNG、临时裁剪PNG、最终透明版、最终描边版的路径"""
+    basename = os.path.basename(jpg_file).replace(".jpg", "")
+    return (
+        basename,
+        os.path.join(temp_dir, f"{basename}_transparent.png"),
+        os.path.join(temp_dir, f"{basename}_cropped_temp.png"),
+        os.path.join(output_dir, f"{basename}_cropped.png"),
+        os.path.join(output_dir, f"{basename}_outlined_cropped.png"),
+    )
+
+def _process_image_in_memory(jpg_file, cropped_final_png, outlined_png, transparent_img=None, outline_size=40, edge_buffer=3, target_ratio=0.5, safety_padding=0.15, exists=os.path.exists):
+    """在内存中完成抠图、裁剪和描边，只写出两张最终图片，不产生临时文件"""
+    if exists(cropped_final_png) and exists(outlined_png):
+        print(f"透明版本和描边版本均已存在: {cropped_final_png}")
+        return
+    
+    # 步骤1: 移除背景（批量抠图时已经传入结果）
+    if transparent_img is None:
+        print("正在执行步骤1: 移除背景")
+        transparent_img = remove(Image.open(jpg_file), session=_get_session())
+    
+    # 步骤2: 裁剪图片使主体居中
+    print("正在执行步骤2: 裁剪居中")
+    cropped_img = crop_to_center_pil(transparent_img, target_ratio, safety_padding)
+    if cropped_img is None:
+        print(f"裁剪失败，使用原始透明图片继续处理: {jpg_file}")
+        cropped_img = transparent_img
+    
+    # 步骤3: 保存透明版本到输出目录
+    if not exists(cropped_final_png):
+        print("正在执行步骤3: 保存透明版本")
+        cropped_img.save(cropped_final_png, **FINAL_PNG_SAVE_KWARGS)
+        print(f"透明版本已保存: {cropped_final_png}")
+    
+    # 步骤4: 添加白色描边
+    if not exists(outlined_png):
+        print("正在执行步骤4: 添加白色描边")
+        outlined_img = create_smooth_no_gap_outline_pil(cropped_img, outline_size, edge_buffer)
+        outlined_img.save(outlined_png, **FINAL_PNG_SAVE_KWARGS)
+        print(f"描边版本已保存: {outlined_png}")
+
+def process_image(jpg_file, output_dir, temp_dir, outline_size=40, edge_buffer=3, target_ratio=0.5, safety_padding=0.15, no_temp=False, transparent_img=None, existing=None):
+    """处理单个JPG图片：抠图 -> 裁剪 -> 加白边
+    
+    no_temp 为True时全部步骤在内存中完成，不写临时文件；
+    transparent_img 为已经抠好的透明图片（仅no_temp时使用）；
+    existing 为预先扫描目录得到的已存在文件路径集合，传入时不再逐个检查文件是否存在
+    成功时返回该图片的处理记录，失败时返回None
+    """
     try:
-        # 确保临时目录和输出目录存在
-        ensure_dir_exists(temp_dir)
-        ensure_dir_exists(output_dir)
-        
-        # 获取文件名（不含扩展名）
-        basename = os.path.basename(jpg_file).replace(".jpg", "")
+        if existing is None:
+            # 单独调用时确保临时目录和输出目录存在
+            if not no_temp:
+                ensure_dir_exists(temp_dir)
+            ensure_dir_exists(output_dir)
+            exists = os.path.exists
+        else:
+            exists = existing.__contains__
         
-        # 定义临时文件和输出文件路径
-        transparent_png = os.path.join(temp_dir, f"{basename}_transparent.png")
-        cropped_png = os.path.join(temp_dir, f"{basename}_cropped_temp.png")
+        # 获取文件名（不含扩展名），定义临时文件和输出文件路径
         # 最终输出文件 - 透明背景版和带白边版
-        cropped_final_png = os.path.join(output_dir, f"{basename}_cropped.png")
-        outlined_png = os.path.join(output_dir, f"{basename}_outlined_cropped.png")
+        basename, transparent_png, cropped_png, cropped_final_png, outlined_png = _image_paths(
+            jpg_file, output_dir, temp_dir
+        )
         
         print(f"\n开始处理: {basename}")
         
-        # 步骤1: 移除背景，生成透明PNG
-        if not os.path.exists(transparent_png):
-            print("正在执行步骤1: 移除背景")
-            success = remove_background(jpg_file, transparent_png)
-            if not success:
-                print(f"移除背景失败，跳过后续处理: {basename}")
-                return False
-        else:
-            print(f"透明PNG已存在: {transparent_png}")
-        
-        # 步骤2: 裁剪图片使主体居中
-        if not os.path.exists(cropped_png):
-            print("正在执行步骤2: 裁剪居中")
-            success = crop_to_center_main_subject(
-                transparent_png, 
-                cropped_png, 
-                target_ratio=target_ratio, 
-                safety_padding=safety_padding
-            )
-            if not success:
-                print(f"裁剪失败，使用原始透明PNG继续处理: {basename}")
-                cropped_png = transparent_png
-        else:
-            print(f"裁剪后的PNG已存在: {cropped_png}")
-        
-        # 步骤3: 保存透明版本到输出目录
-        if not os.path.exists(cropped_final_png):
-            print("正在执行步骤3: 保存透明版本")
-            shutil.copy2(cropped_png, cropped_final_png)
-            print(f"透明版本已保存: {cropped_final_png}")
-        else:
-            print(f"透明版本已存在: {cropped_final_png}")
-        
-        # 步骤4: 添加白色描边
-        if not os.path.exists(outlined_png):
-            print("正在执行步骤4: 添加白色描边")
-            create_smooth_no_gap_outline(
-                cropped_png, 
+        if no_temp:
+            _process_image_in_memory(
+                jpg_file,
+                cropped_final_png,
                 outlined_png,
+                transparent_img,
                 outline_size=outline_size,
-                edge_buffer=edge_buffer
+                edge_buffer=edge_buffer,
+                target_ratio=target_ratio,
+                safety_padding=safety_padding,
+                exists=exists
             )
-            print(f"描边版本已保存: {outlined_png}")
         else:
-            print(f"描边版本已存在: {outlined_png}")
+            # 步骤1: 移除背景，生成透明PNG
+            if not exists(transparent_png):
+                print("正在执行步骤1: 移除背景")
+                success = remove_background(jpg_file, transparent_png)
+                if not success:
+                    print(f"移除背景失败，跳过后续处理: {basename}")
+                    return None
+            else:
+                print(f"透明PNG已存在: {transparent_png}")
+        
+            # 步骤2: 裁剪图片使主体居中
+            if not exists(cropped_png):
+                print("正在执行步骤2: 裁剪居中")
+                success = crop_to_center_main_subject(
+                    transparent_png, 
+                    cropped_png, 
+                    target_ratio=target_ratio, 
+                    safety_padding=safety_padding
+                )
+                if not success:
+                    print(f"裁剪失败，使用原始透明PNG继续处理: {basename}")
+                    # 未找到主体时裁剪函数已按最终压缩级别写出原图副本，直接使用；
+                    # 出错时没有写出文件，才退回未压缩的临时透明PNG
+                    if not os.path.exists(cropped_png):
+                        cropped_png = transparent_png
+            else:
+                print(f"裁剪后的PNG已存在: {cropped_png}")
+        
+            # 步骤3: 保存透明版本到输出目录
+            if not exists(cropped_final_png):
+                print("正在执行步骤3: 保存透明版本")
+                copy_file(cropped_png, cropped_final_png)
+                print(f"透明版本已保存: {cropped_final_png}")
+            else:
+                print(f"透明版本已存在: {cropped_final_png}")
+        
+            # 步骤4: 添加白色描边
+            if not exists(outlined_png):
+                print("正在执行步骤4: 添加白色描边")
+                create_smooth_no_gap_outline(
+                    cropped_png, 
+                    outlined_png,
+                    outline_size=outline_size,
+                    edge_buffer=edge_buffer
+                )
+                print(f"描边版本已保存: {outlined_png}")
+            else:
+                print(f"描边版本已存在: {outlined_png}")
         
-        # 更新已处理图片记录
-        records = load_processed_records()
-        records["processed_images"][basename] = {
+        print(f"图片处理完成: {basename}")
+        print(f"- 透明版本: {cropped_final_png}")
+        print(f"- 带白边版本: {outlined_png}")
+        # 返回处理记录，由主进程统一写入记录文件，避免多个进程同时改写
+        return {
             "processed_at": datetime.now().isoformat(),
             "original_file": jpg_file,
             "transparent_png": cropped_final_png,
             "outlined_png": outlined_png
         }
-        save_processed_records(records)
-        
-        print(f"图片处理完成: {basename}")
-        print(f"- 透明版本: {cropped_final_png}")
-        print(f"- 带白边版本: {outlined_png}")
-        return True
     except Exception as e:
         print(f"处理图片过程中发生错误 {jpg_file}: {e}")
-        return False
+        return None
+
+def _process_chunk(jpg_files, output_dir, temp_dir, no_temp=False, existing=None, **kwargs):
+    """先对一组图片批量抠图，再逐张完成裁剪和描边，返回每张图片的处理记录
+    
+    existing 为这组图片中已存在的文件路径集合，为None时逐个检查文件是否存在
+    """
+    exists = os.path.exists if existing is None else existing.__contains__
+    if no_temp:
+        # 抠图结果直接留在内存中交给 process_image，两张最终图片都已存在的不再抠图
+        pending = []
+        for jpg_file in jpg_files:
+            _, _, _, cropped_final_png, outlined_png = _image_paths(jpg_file, output_dir, temp_dir)
+            if not (exists(cropped_final_png) and exists(outlined_png)):
+                pending.append(jpg_file)
+        cutouts = {}
+        if len(pending) > 1:
+            try:
+                print(f"正在批量移除背景: {len(pending)} 张图片")
+                cutouts = dict(zip(pending, _cutout_images(pending)))
+            except Exception as e:
+                print(f"批量移除背景失败: {e}")
+        return [
+            process_image(jpg_file, output_dir, temp_dir, no_temp=True,
+                          transparent_img=cutouts.pop(jpg_file, None), existing=existing, **kwargs)
+            for jpg_file in jpg_files
+        ]
+    
+    pending = []
+    for jpg_file in jpg_files:
+        transparent_png = _image_paths(jpg_file, output_dir, temp_dir)[1]
+        if not exists(transparent_png):
+            pending.append((jpg_file, transparent_png))
+    
+    # 批量抠图失败时不做处理，process_image 会逐张重新抠图
+    if len(pending) > 1:
+        if remove_backgrounds([jpg for jpg, _ in pending], [png for _, png in pending]) and existing is not None:
+            existing.update(png for _, png in pending)
+    
+    return [process_image(jpg_file, output_dir, temp_dir, existing=existing, **kwargs) for jpg_file in jpg_files]
 
-def process_images(input_dir, output_dir, temp_dir, outline_size=40, edge_buffer=3, target_ratio=0.5, safety_padding=0.15, only_new=True):
-    """处理指定目录下的所有JPG图片"""
+def _process_in_pool(records, jpg_files, output_dir, temp_dir, outline_size, edge_buffer, target_ratio, safety_padding, jobs=None, device="cpu", batch_size=None, no_temp=False):
+    """并行处理图片，在主进程中把结果写入 records，返回成功数量
+    
+    每完成一张图片向追加日志写一行记录，全部结束后一次性写入记录文件
+    
+    CPU推理使用进程池；GPU推理只在当前进程加载一次模型，用线程池并行读写图片。
+    每个任务包含 batch_size 张图片，抠图时一次推理完成
+    """
+    workers = jobs or os.cpu_count()
+    # 图片较少时减小每组数量，让所有工作进程都分到任务
+    batch_size = batch_size or REMBG_BATCH_SIZE[device]
+    batch_size = max(1, min(batch_size, -(-len(jpg_files) // workers)))
+    chunks = [jpg_files[i:i + batch_size] for i in range(0, len(jpg_files), batch_size)]
+    
+    worker = functools.partial(
+        _process_chunk,
+        output_dir=output_dir,
+        temp_dir=temp_dir,
+        outline_size=outline_size,
+        edge_buffer=edge_buffer,
+        target_ratio=target_ratio,
+        safety_padding=safety_padding,
+        no_temp=no_temp
+    )
+    # 扫描一次输出目录和临时目录，之后每张图片不再单独检查文件是否存在
+    existing = {os.path.join(output_dir, name) for name in os.listdir(output_dir)}
+    if not no_temp:
+        existing.update(os.path.join(temp_dir, name) for name in os.listdir(temp_dir))
+    
+    success_count = 0
+    if device == "cpu":
+        # 每个工作进程启动时加载一次模型，之后处理的所有图片复用同一个会话；
+        # 各进程平分CPU核心作为推理线程，避免进程数×核心数个线程互相争抢
+        threads = max(1, os.cpu_count() // workers)
+        executor = ProcessPoolExecutor(max_workers=workers,
+                                       initializer=_get_session, initargs=(device, threads))
+    else:
+        # 显存中只放一份模型，所有线程共用同一个会话
+        _get_session(device)
+        executor = ThreadPoolExecutor(max_workers=workers)
+    
+    with executor, open(PROCESSED_LOG_FILE, 'ab', buffering=BUFFER_SIZE) as log:
+        # 每个任务只带上自己这组图片相关的已存在文件
+        futures = {
+            executor.submit(worker, chunk, existing={
+                path for jpg_file in chunk
+                for path in _image_paths(jpg_file, output_dir, temp_dir)[1:] if path in existing
+            }): chunk
+            for chunk in chunks
+        }
+        for future in as_completed(futures):
+            for jpg_file, record in zip(futures[future], future.result()):
+                if record is None:
+                    continue
+                basename = os.path.basename(jpg_file).replace(".jpg", "")
+                records["processed_images"][basename] = record
+                log.write(dumps_json({basename: record}, compact=True) + b'\n')
+                success_count += 1
+            log.flush()
+    
+    # 追加日志合并进记录文件
+    save_processed_records(records)
+    return success_count
+
+def process_images(input_dir, output_dir, temp_dir, outline_size=40, edge_buffer=3, target_ratio=0.5, safety_padding=0.15, only_new=True, jobs=None, device="cpu", batch_size=None, no_temp=False):
+    """处理指定目录下的所有JPG图片
+    
+    jobs 为并行处理的进程数，默认使用全部CPU核心
+    device 为抠图模型的推理设备: cpu、cuda 或 coreml
+    batch_size 为每次抠图推理的图片数量，默认按设备选择
+    no_temp 为True时在内存中完成所有步骤，不写临时文件
+    """
     # 确保输出目录和临时目录存在
     ensure_dir_exists(output_dir)
-    ensure_dir_exists(temp_dir)
+    if not no_temp:
+        ensure_dir_exists(temp_dir)
     
     # 获取所有JPG文件
     jpg_files = glob.glob(os.path.join(input_dir, "*.jpg"))
     
+    # 已处理的图片记录只在这里加载一次，处理过程中在内存里更新
+    records = load_processed_records()
+    
     if only_new:
-        # 加载已处理的图片记录
-        records = load_processed_records()
-        processed_images = records["processed_images"]
-        
         # 过滤出未处理的图片
-        unprocessed_jpg_files = []
-        for jpg_file in jpg_files:
-            basename = os.path.basename(jpg_file).replace(".jpg", "")
-            if basename not in processed_images:
-                unprocessed_jpg_files.append(jpg_file)
+        processed_set = set(records["processed_images"])
+        unprocessed_jpg_files = [
+            jpg_file for jpg_file in jpg_files
+            if os.path.basename(jpg_file).replace(".jpg", "") not in processed_set
+        ]
         
         print(f"找到 {len(jpg_files)} 个JPG文件，其中 {len(unprocessed_jpg_files)} 个未处理")
         
@@ -355,46 +542,38 @@ def process_images(input_dir, output_dir, temp_dir, outline_size=40, edge_buffer
             print("没有新图片需要处理")
             return 0
         
-        # 处理每个未处理的文件
-        success_count = 0
-        for jpg_file in unprocessed_jpg_files:
-            if process_image(
-                jpg_file, 
-                output_dir, 
-                temp_dir, 
-                outline_size=outline_size, 
-                edge_buffer=edge_buffer,
-                target_ratio=target_ratio,
-                safety_padding=safety_padding
-            ):
-                success_count += 1
+        # 并行处理每个未处理的文件
+        success_count = _process_in_pool(
+            records, unprocessed_jpg_files, output_dir, temp_dir,
+            outline_size, edge_buffer, target_ratio, safety_padding, jobs, device, batch_size, no_temp
+        )
         
         print(f"\n所有图片处理完成! 成功处理 {success_count}/{len(unprocessed_jpg_files)} 张新图片")
     else:
         # 处理所有图片，不管是否处理过
         print(f"找到 {len(jpg_files)} 个JPG文件")
         
-        # 处理每个文件
-        success_count = 0
-        for jpg_file in jpg_files:
-            if process_image(
-                jpg_file, 
-                output_dir, 
-                temp_dir, 
-                outline_size=outline_size, 
-                edge_buffer=edge_buffer,
-                target_ratio=target_ratio,
-                safety_padding=safety_padding
-            ):
-                success_count += 1
+        if not jpg_files:
+            return 0
+        
+        # 并行处理每个文件
+        success_count = _process_in_pool(
+            records, jpg_files, output_dir, temp_dir,
+            outline_size, edge_buffer, target_ratio, safety_padding, jobs, device, batch_size, no_temp
+        )
         
         print(f"\n所有图片处理完成! 成功处理 {success_count}/{len(jpg_files)} 张图片")
     
     print(f"请查看 {output_dir} 目录下的最终结果")
     return success_count
 
-def merge_images(source_dir, target_dir):
-    """将源目录中的图片合并到目标目录"""
+def merge_images(source_dir, target_dir, link=False):
+    """将源目录中的图片合并到目标目录
+    
+    默认生成独立的文件副本（copy_file_range，在支持reflink的文件系统上共享数据块）；
+    link=True 时创建硬链接，无法链接时复制。硬链接与批次目录中的文件是同一个文件，
+    之后原地压缩目标目录（png_optimizer）会同时改动批次目录中留作验收的图片
+    """
     if not os.path.exists(source_dir):
         print(f"源目录不存在: {source_dir}")
         return 0
@@ -402,7 +581,8 @@ def merge_images(source_dir, target_dir):
     if not os.path.exists(target_dir):
         ensure_dir_exists(target_dir)
     
-    merged_count = 0
+    # 先收集需要合并的文件
+    pairs = []
     for filename in os.listdir(source_dir):
         if filename.endswith('.png'):
             src_path = os.path.join(source_dir, filename)
@@ -412,16 +592,25 @@ def merge_images(source_dir, target_dir):
             if os.path.exists(dst_path):
                 print(f"跳过已存在文件: {filename}")
                 continue
-            
-            # 复制文件
-            shutil.copy2(src_path, dst_path)
-            merged_count += 1
-            print(f"合并文件: {filename}")
+            pairs.append((src_path, dst_path))
+    
+    transfer = link_or_copy if link else copy_file
+    # 多个线程同时链接或复制文件，itertools.count 的 next() 在线程间是安全的
+    counter = itertools.count(1)
     
+    def merge_one(pair):
+        src_path, dst_path = pair
+        transfer(src_path, dst_path)
+        print(f"合并文件 ({next(counter)}/{len(pairs)}): {os.path.basename(src_path)}")
+    
+    with ThreadPoolExecutor(max_workers=MERGE_WORKERS) as executor:
+        list(executor.map(merge_one, pairs))
+    
+    merged_count = len(pairs)
     print(f"\n合并完成! 共合并 {merged_count} 个文件到 {target_dir}")
     return merged_count
 
-def process_batch(batch_date=None, only_new=True):
+def process_batch(batch_date=None, only_new=True, jobs=None, device="cpu", batch_size=None, no_temp=False):
     """处理指定批次的图片"""
     # 如果未指定批次日期，使用当前日期
     if batch_date is None:
@@ -453,7 +642,11 @@ def process_batch(batch_date=None, only_new=True):
         edge_buffer=3,
         target_ratio=0.5,
         safety_padding=0.15,
-        only_new=only_new
+        only_new=only_new,
+        jobs=jobs,
+        device=device,
+        batch_size=batch_size,
+        no_temp=no_temp
     )
     
     # 提供后续步骤提示
@@ -466,6 +659,11 @@ def process_batch(batch_date=None, only_new=True):
     
     return processed_count
 
+def check_pillow_simd():
+    """Pillow-SIMD 的版本号带有 .postN 后缀，未安装时给出提示"""
+    if 'post' not in PIL_VERSION:
+        print(f"提示: 当前使用 Pillow {PIL_VERSION}，安装 Pillow-SIMD 可以加快图片处理 (pip install pillow-simd)")
+
 def main():
     # 解析命令行参数
     parser = argparse.ArgumentParser(description='图片处理工具 - 将JPG转换为透明背景PNG')
@@ -476,13 +674,27 @@ def main():
     parser.add_argument('--merge', action='store_true', help='合并验收目录的图片到最终目录')
     parser.add_argument('--merge-from', help='合并源目录 (与--merge一起使用)')
     parser.add_argument('--merge-to', help='合并目标目录 (与--merge一起使用)')
+    parser.add_argument('--link', action='store_true',
+                        help='合并时创建硬链接而不是复制，目标文件与批次目录中的文件共用存储，'
+                             '原地压缩时两边会一起改变 (与--merge一起使用)')
     parser.add_argument('--temp-dir', default=None, help=f'临时文件目录 (默认: {TEMP_RESULTS_DIR}/当前日期)')
+    parser.add_argument('--jobs', type=int, default=None, help='并行处理的进程数，每个进程各加载一份U2Net模型（每份占用数百MB内存），'
+                             '推理线程在进程间平分CPU核心 (默认: CPU核心数)')
+    parser.add_argument('--device', choices=sorted(DEVICE_PROVIDERS), default='cpu',
+                        help='抠图模型的推理设备 (默认: cpu，cuda需要安装onnxruntime-gpu)')
+    parser.add_argument('--rembg-batch', type=int, default=None,
+                        help='每次抠图推理的图片数量 (默认: CPU为8，GPU为32)')
+    parser.add_argument('--no-temp', action='store_true',
+                        help='在内存中完成抠图、裁剪和描边，不写临时文件')
     
     args = parser.parse_args()
     
     # 获取当前日期
     current_date = get_current_date()
     
+    if not args.merge:
+        check_pillow_simd()
+    
     # 如果是合并模式，执行合并操作
     if args.merge:
         source_dir = args.merge_from if args.merge_from else args.input_dir
@@ -492,12 +704,12 @@ def main():
             print("错误: 合并模式需要指定源目录")
             return
         
-        merge_images(source_dir, target_dir)
+        merge_images(source_dir, target_dir, args.link)
         return
     
     # 如果指定了批次，则处理该批次
     if args.batch:
-        process_batch(args.batch, not args.all)
+        process_batch(args.batch, not args.all, args.jobs, args.device, args.rembg_batch, args.no_temp)
         return
     
     # 如果指定了输入和输出目录，使用指定的目录
@@ -521,7 +733,11 @@ def main():
         edge_buffer=3,             # 边缘缓冲区大小
         target_ratio=0.5,          # 主体占图片的面积比例
         safety_padding=0.15,       # 主体周围的安全边距
-        only_new=not args.all      # 是否只处理新图片
+        only_new=not args.all,     # 是否只处理新图片
+        jobs=args.jobs,            # 并行进程数
+        device=args.device,        # 推理设备
+        batch_size=args.rembg_batch,  # 每次抠图推理的图片数量
+        no_temp=args.no_temp       # 不写临时文件
     )
     
     if processed_count > 0:
@@ -1,13 +1,12 @@
 #!/usr/bin/env python3
 import os
-import json
-import glob
 import logging
 import argparse
 from datetime import datetime
 from pathlib import Path
 
 from api.processors.metadata_generator import generate_metadata_for_image
+from jsonio import BUFFER_SIZE, dumps_json, read_json, recover_jsonl, write_json
 
 # 设置日志记录
 logging.basicConfig(
@@ -16,6 +15,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def save_metadata(metadata_file, metadata):
+    """先写入临时文件再原子替换，避免中途出错留下不完整的元数据文件"""
+    tmp_file = metadata_file + ".tmp"
+    write_json(tmp_file, metadata)
+    os.replace(tmp_file, metadata_file)
+
 def regenerate_all_metadata(output_dir=None, batch_size=None):
     """重新生成所有图片的元数据
     
@@ -41,12 +46,12 @@ def regenerate_all_metadata(output_dir=None, batch_size=None):
         logger.error(f"processed-images目录不存在: {processed_images_dir}")
         return None
     
-    # 查找所有PNG图片
-    png_pattern = os.path.join(processed_images_dir, "*.png")
-    png_files = glob.glob(png_pattern)
-    
-    # 过滤出包含"outlined_cropped"的图片
-    outlined_files = [f for f in png_files if "_outlined_cropped.png" in f]
+    # 扫描一次目录，只保留带描边的图片（跳过隐藏文件，与glob行为一致）
+    with os.scandir(processed_images_dir) as it:
+        outlined_files = [
+            entry.path for entry in it
+            if entry.name.endswith("_outlined_cropped.png") and not entry.name.startswith('.')
+        ]
     
     if not outlined_files:
         logger.warning("未找到需要处理的图片")
@@ -70,67 +75,73 @@ def regenerate_all_metadata(output_dir=None, batch_size=None):
     processed_filenames = set()
     if os.path.exists(metadata_file):
         try:
-            with open(metadata_file, 'r', encoding='utf-8') as f:
-                all_metadata = json.load(f)
-                logger.info(f"加载了现有元数据文件，包含 {len(all_metadata)} 条记录")
-                
-                # 记录已处理的文件名
-                for item in all_metadata:
-                    if 'path' in item:
-                        processed_filenames.add(os.path.basename(item['path']))
+            all_metadata = read_json(metadata_file)
+            logger.info(f"加载了现有元数据文件，包含 {len(all_metadata)} 条记录")
+            
+            # 记录已处理的文件名
+            for item in all_metadata:
+                if 'path' in item:
+                    processed_filenames.add(os.path.basename(item['path']))
         except Exception as e:
             logger.error(f"加载元数据文件失败: {str(e)}")
             all_metadata = []
     
+    # 运行过程中新生成的元数据逐行追加到 .ndjson 文件，结束时再一次性合并写入 images.json
+    # 上次运行中断时，先恢复其中已生成的记录
+    progress_file = metadata_file + ".ndjson"
+    if os.path.exists(progress_file):
+        # 中断时最后一行可能只写了一半，恢复时截掉，之后继续在完整的行后追加
+        recovered = recover_jsonl(progress_file)
+        for item in recovered:
+            all_metadata.append(item)
+            if 'path' in item:
+                processed_filenames.add(os.path.basename(item['path']))
+        logger.info(f"从上次中断的运行中恢复了 {len(recovered)} 条记录")
+    
     # 统计信息
     total_processed = 0
     success_count = 0
     failed_count = 0
     skipped_count = 0
     
-    # 处理所有批次
-    for batch_idx, batch in enumerate(batches):
-        logger.info(f"开始处理第 {batch_idx+1}/{len(batches)} 批")
-        
-        # 处理批次中的每个图片
-        for image_path in batch:
-            filename = os.path.basename(image_path)
-            
-            # 如果已经处理过，跳过
-            if filename in processed_filenames:
-                logger.info(f"跳过已处理的图片: {filename}")
-                skipped_count += 1
-                continue
+    with open(progress_file, 'ab', buffering=BUFFER_SIZE) as progress:
+        # 处理所有批次
+        for batch_idx, batch in enumerate(batches):
+            logger.info(f"开始处理第 {batch_idx+1}/{len(batches)} 批")
             
-            # 生成元数据
-            try:
-                metadata = generate_metadata_for_image(image_path, filename)
+            # 处理批次中的每个图片
+            for image_path in batch:
+                filename = os.path.basename(image_path)
                 
-                if metadata:
-                    all_metadata.append(metadata)
-                    success_count += 1
-                    logger.info(f"已生成元数据: {filename}")
-                else:
-                    failed_count += 1
-                    logger.warning(f"无法生成元数据: {filename}")
-                
-                total_processed += 1
-                
-                # 每处理100张图片，保存一次元数据文件
-                if total_processed % 100 == 0:
-                    with open(metadata_file, 'w', encoding='utf-8') as f:
-                        json.dump(all_metadata, f, indent=2, ensure_ascii=False)
-                    logger.info(f"已保存中间结果，处理进度: {total_processed}/{len(outlined_files)}")
+                # 如果已经处理过，跳过
+                if filename in processed_filenames:
+                    logger.info(f"跳过已处理的图片: {filename}")
+                    skipped_count += 1
+                    continue
                 
-            except Exception as e:
-                failed_count += 1
-                logger.error(f"处理图片失败: {filename} - {str(e)}")
-                total_processed += 1
-        
-        # 每批结束后保存元数据文件
-        with open(metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(all_metadata, f, indent=2, ensure_ascii=False)
-        logger.info(f"批次 {batch_idx+1} 完成，已保存元数据文件")
+                # 生成元数据
+                try:
+                    metadata = generate_metadata_for_image(image_path, filename)
+                    
+                    if metadata:
+                        all_metadata.append(metadata)
+                        progress.write(dumps_json(metadata, compact=True) + b'\n')
+                        success_count += 1
+                        logger.info(f"已生成元数据: {filename}")
+                    else:
+                        failed_count += 1
+                        logger.warning(f"无法生成元数据: {filename}")
+                    
+                    total_processed += 1
+                    
+                except Exception as e:
+                    failed_count += 1
+                    logger.error(f"处理图片失败: {filename} - {str(e)}")
+                    total_processed += 1
+            
+            # 每批结束后把新记录刷到磁盘，images.json 只在最后写入一次
+            progress.flush()
+            logger.info(f"批次 {batch_idx+1} 完成，处理进度: {total_processed}/{len(outlined_files)}")
     
     # 再次检查元数据质量
     valid_metadata = []
@@ -140,9 +151,9 @@ def regenerate_all_metadata(output_dir=None, batch_size=None):
         else:
             logger.warning(f"发现不完整的元数据项: {item.get('path', '未知路径')}")
     
-    # 保存最终元数据文件
-    with open(metadata_file, 'w', encoding='utf-8') as f:
-        json.dump(valid_metadata, f, indent=2, ensure_ascii=False)
+    # 保存最终元数据文件，合并完成后删除逐行追加的进度文件
+    save_metadata(metadata_file, valid_metadata)
+    os.remove(progress_file)
     
     logger.info(f"元数据生成完成:")
     logger.info(f"  - 总图片数量: {len(outlined_files)}")
@@ -162,9 +173,12 @@ def verify_api_metadata_coverage():
         logger.error(f"API元数据目录不存在: {api_metadata_dir}")
         return
     
-    # 获取所有API元数据文件
-    api_metadata_files = glob.glob(os.path.join(api_metadata_dir, "*.json"))
-    api_ids = set([os.path.splitext(os.path.basename(f))[0] for f in api_metadata_files])
+    # 获取所有API元数据文件，文件名去掉 .json 即为Unsplash ID
+    with os.scandir(api_metadata_dir) as it:
+        api_ids = {
+            entry.name[:-len(".json")] for entry in it
+            if entry.name.endswith(".json") and not entry.name.startswith('.')
+        }
     
     logger.info(f"找到 {len(api_ids)} 个已保存的API元数据文件")
     
@@ -180,8 +194,7 @@ def verify_api_metadata_coverage():
         return
     
     try:
-        with open(metadata_file, 'r', encoding='utf-8') as f:
-            all_metadata = json.load(f)
+        all_metadata = read_json(metadata_file)
     except Exception as e:
         logger.error(f"加载元数据文件失败: {str(e)}")
         return
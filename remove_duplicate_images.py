@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import json
+from jsonio import read_json, write_images_json
 
 def remove_duplicates():
     """移除重复的图片条目"""
@@ -9,15 +9,14 @@ def remove_duplicates():
     api_file = 'api/data/images.json'
     frontend_file = 'project/src/data/images.json'
     
-    # 要移除的ID
-    ids_to_remove = [
+    # 要移除的ID（集合，过滤时O(1)判断）
+    ids_to_remove = frozenset([
         "bobmelo-H6VxhE_x-kE-unsplash",  # 重复的苹果碗图片
         "waiheng_tobi-zLCR7RsxYGs-unsplash"  # 重复的咬了一口的红苹果图片
-    ]
+    ])
     
     # 修改API文件
-    with open(api_file, 'r') as f:
-        data = json.load(f)
+    data = read_json(api_file)
     
     # 移除重复图片
     original_count = len(data)
@@ -27,12 +26,10 @@ def remove_duplicates():
     print(f'已从API文件中移除 {removed_count} 个重复图片')
     
     # 保存修改后的API文件
-    with open(api_file, 'w') as f:
-        json.dump(data, f, indent=2)
+    write_images_json(api_file, data)
     
     # 修改前端文件
-    with open(frontend_file, 'r') as f:
-        data = json.load(f)
+    data = read_json(frontend_file)
     
     # 移除重复图片
     original_count = len(data)
@@ -42,8 +39,7 @@ def remove_duplicates():
     print(f'已从前端文件中移除 {removed_count} 个重复图片')
     
     # 保存修改后的前端文件
-    with open(frontend_file, 'w') as f:
-        json.dump(data, f, indent=2)
+    write_images_json(frontend_file, data)
     
     print('修改完成！')
 
@@ -5,11 +5,19 @@
 从元数据文件中删除指定ID的图片信息
 """
 
-import json
 import os
+from jsonio import read_json, write_images_json
 
 def remove_image_from_metadata(image_id, metadata_files):
-    """从多个元数据文件中删除特定ID的图片"""
+    """从多个元数据文件中删除特定ID的图片
+    
+    image_id 可以是单个ID，也可以是多个ID组成的列表或集合
+    """
+    if isinstance(image_id, str):
+        image_ids = frozenset([image_id])
+    else:
+        image_ids = frozenset(image_id)
+    
     for metadata_file in metadata_files:
         if not os.path.exists(metadata_file):
             print(f"文件不存在: {metadata_file}")
@@ -18,14 +26,13 @@ def remove_image_from_metadata(image_id, metadata_files):
         print(f"处理文件: {metadata_file}")
         
         # 读取元数据文件
-        with open(metadata_file, 'r', encoding='utf-8') as f:
-            metadata = json.load(f)
+        metadata = read_json(metadata_file)
         
         # 记录原始数量
         original_count = len(metadata)
         
         # 过滤掉指定ID的图片
-        metadata = [img for img in metadata if img['id'] != image_id]
+        metadata = [img for img in metadata if img['id'] not in image_ids]
         
         # 记录新数量
         new_count = len(metadata)
@@ -36,8 +43,7 @@ def remove_image_from_metadata(image_id, metadata_files):
             print(f"已从元数据中删除 {original_count - new_count} 条记录")
             
             # 保存更新后的元数据
-            with open(metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, ensure_ascii=False, indent=2)
+            write_images_json(metadata_file, metadata)
             
             print(f"已保存更新后的元数据到 {metadata_file}")
 
@@ -8,19 +8,33 @@
 
 import os
 import json
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 
-# 需要修正的图片标题
-TARGET_CAPTIONS = [
+from jsonio import write_images_json
+
+# 需要修正的图片标题（集合，每项只需一次哈希查找）
+TARGET_CAPTIONS = frozenset({
     "A cathayo airplane flying in the sky",
     "Cathayo airplane sticker",
     "A view of the wing of an airplane",
     "A view of a plane wing from the window",
     "American airlines a320 - 300",
     "Qatar a380 - 300 - qatar airways - qatar airways"
-]
+})
 
 # 要设置的标签
 TARGET_TAG = "airplane"
+# 所有命中项共用同一个标签列表对象（不要原地修改）
+TARGET_TAGS = [TARGET_TAG]
+
+# 目标标题在JSON文件中的编码形式（带引号），解析前先在原始字节中查找，
+# 一个都找不到就说明文件中没有需要修改的项，无需解析和重写
+_CAPTION_NEEDLES = tuple(json.dumps(c).encode('utf-8') for c in TARGET_CAPTIONS)
+
+# 读写元数据文件的缓冲区大小
+FILE_BUFFER_SIZE = 1 << 20
 
 # 元数据文件路径
 METADATA_FILES = [
@@ -30,60 +44,83 @@ METADATA_FILES = [
 ]
 
 def fix_metadata_file(file_path):
-    """修正指定元数据文件中的标签"""
+    """修正指定元数据文件中的标签
+    
+    返回该文件的输出行列表，由调用方统一打印，避免并行处理时输出交错
+    """
+    log = []
     if not os.path.exists(file_path):
-        print(f"文件不存在: {file_path}")
-        return
+        log.append(f"文件不存在: {file_path}")
+        return log
+    
+    # 读取文件原始内容
+    with open(file_path, 'rb', buffering=FILE_BUFFER_SIZE) as f:
+        raw = f.read()
     
-    # 读取文件
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    if not any(needle in raw for needle in _CAPTION_NEEDLES):
+        log.append("未找到需要修改的项目")
+        return log
     
-    # 创建备份
-    backup_path = f"{file_path}.bak"
-    with open(backup_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"已创建备份: {backup_path}")
+    data = orjson.loads(raw)
     
     # 计数器
     modified_count = 0
     
-    # 遍历所有元数据项
-    for item in data:
-        caption = item.get("caption", "")
+    # 先用推导式筛出标题命中的项，逐项处理只针对这些项
+    captions = TARGET_CAPTIONS
+    targets = [item for item in data if item.get("caption") in captions]
+    
+    for item in targets:
+        caption = item["caption"]
+        
+        # 记录旧标签
+        old_tags = item.get("tags", [])
+        if isinstance(old_tags, str):
+            old_tags = [old_tags]
+        
+        # 设置新标签
+        item["tags"] = TARGET_TAGS
         
-        # 检查是否是目标标题
-        if caption in TARGET_CAPTIONS:
-            # 记录旧标签
-            old_tags = item.get("tags", [])
-            if isinstance(old_tags, str):
-                old_tags = [old_tags]
-            
-            # 设置新标签
-            item["tags"] = [TARGET_TAG]
-            
-            modified_count += 1
-            print(f"已修改: '{caption}'")
-            print(f"  旧标签: {old_tags}")
-            print(f"  新标签: ['{TARGET_TAG}']")
+        modified_count += 1
+        log.append(f"已修改: '{caption}'")
+        log.append(f"  旧标签: {old_tags}")
+        log.append(f"  新标签: ['{TARGET_TAG}']")
     
     # 保存修改后的文件
     if modified_count > 0:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"已保存修改，共修改 {modified_count} 项")
+        # 先把原文件硬链接为备份，再写入临时文件并原子替换
+        # 没有修改时不创建备份
+        backup_path = f"{file_path}.bak"
+        if os.path.exists(backup_path):
+            os.remove(backup_path)
+        try:
+            os.link(file_path, backup_path)
+        except OSError:
+            # 不支持硬链接时复制原始字节
+            shutil.copyfile(file_path, backup_path)
+        log.append(f"已创建备份: {backup_path}")
+        
+        write_images_json(file_path, data)
+        log.append(f"已保存修改，共修改 {modified_count} 项")
     else:
-        print("未找到需要修改的项目")
+        log.append("未找到需要修改的项目")
+    
+    return log
 
 def main():
     """主函数"""
     print("开始修正元数据标签...")
     
-    for file_path in METADATA_FILES:
+    # 各文件相互独立，分到多个线程并行读写
+    with ThreadPoolExecutor(max_workers=len(METADATA_FILES)) as executor:
+        logs = list(executor.map(fix_metadata_file, METADATA_FILES))
+    
+    for file_path, log in zip(METADATA_FILES, logs):
         print(f"\n处理文件: {file_path}")
-        fix_metadata_file(file_path)
+        for line in log:
+            print(line)
     
     print("\n处理完成!")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
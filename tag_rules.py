@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+标签修正规则
+
+fix_tags.py 使用的标题精确匹配表和关键词/模糊匹配函数。
+本模块只定义规则，导入时不配置日志、不读写文件。
+"""
+
+import re
+import functools
+from rapidfuzz import fuzz, process, utils
+
+# 元数据文件路径
+METADATA_FILES = [
+    "metadata/images.json",
+    "project/src/data/images.json",
+    "api/data/images.json"
+]
+
+# 需要修正的图片标题和对应的标签（精确匹配）
+TITLE_TO_TAG = {
+    "A cathayo airplane flying in the sky": "airplane",
+    "Cathayo airplane sticker": "airplane",
+    "A view of the wing of an airplane": "airplane",
+    "A view of a plane wing from the window": "airplane",
+    "American airlines a320 - 300": "airplane",
+    "Qatar a380 - 300 - qatar airways - qatar airways": "airplane",
+    "A white plate with a yellow rim": "apple",
+    "A bottle of beer": "apple"
+}
+
+# 需要修正的描述列表及其对应的正确标签
+CORRECTIONS = [
+    {"caption": "A cathayo airplane flying in the sky", "correct_tag": "airplane"},
+    {"caption": "Cathayo airplane sticker", "correct_tag": "airplane"},
+    {"caption": "A view of the wing of an airplane", "correct_tag": "airplane"},
+    {"caption": "A view of a plane wing from the window", "correct_tag": "airplane"},
+    {"caption": "American airlines a320 - 300", "correct_tag": "airplane"},
+    {"caption": "Qatar a380 - 300 - qatar airways - qatar airways", "correct_tag": "airplane"},
+    
+    # 添加更多航空相关关键词
+    {"caption": "airplane", "correct_tag": "airplane"},
+    {"caption": "plane", "correct_tag": "airplane"},
+    {"caption": "aircraft", "correct_tag": "airplane"},
+    {"caption": "jet", "correct_tag": "airplane"},
+    {"caption": "airliner", "correct_tag": "airplane"},
+    {"caption": "flight", "correct_tag": "airplane"},
+    {"caption": "flying", "correct_tag": "airplane"},
+    {"caption": "wing", "correct_tag": "airplane"},
+    {"caption": "airport", "correct_tag": "airplane"},
+    {"caption": "airline", "correct_tag": "airplane"},
+    {"caption": "airways", "correct_tag": "airplane"},
+    {"caption": "boeing", "correct_tag": "airplane"},
+    {"caption": "airbus", "correct_tag": "airplane"},
+    {"caption": "a320", "correct_tag": "airplane"},
+    {"caption": "a380", "correct_tag": "airplane"},
+]
+
+# 每个正确标签对应的单元素标签列表，所有修正项共用同一个列表对象（不要原地修改）
+CORRECT_TAG_LISTS = {
+    tag: [tag]
+    for tag in {*TITLE_TO_TAG.values(), *(c["correct_tag"] for c in CORRECTIONS)}
+}
+
+# 模糊匹配的相似度阈值 (0-100)
+SIMILARITY_CUTOFF = 70
+
+# 单词描述编译成一个正则，一次扫描即可判断描述中是否包含任意关键词
+_SINGLE_WORD_CORRECTIONS = [c for c in CORRECTIONS if len(c["caption"].split()) == 1]
+KEYWORD_RE = re.compile(
+    '|'.join(map(re.escape, (c["caption"].lower() for c in _SINGLE_WORD_CORRECTIONS)))
+)
+KEYWORD_TAGS = {c["caption"].lower(): c["correct_tag"] for c in _SINGLE_WORD_CORRECTIONS}
+# 反向包含（描述是某个关键词的一部分）用换行拼接后一次子串查找
+_KEYWORD_TEXT = '\n'.join(KEYWORD_TAGS)
+
+# 多词描述预先处理好，只在关键词未命中时交给rapidfuzz一次性比较
+MULTI_WORD_CORRECTIONS = [c for c in CORRECTIONS if len(c["caption"].split()) > 1]
+MULTI_WORD_CHOICES = [utils.default_process(c["caption"]) for c in MULTI_WORD_CORRECTIONS]
+MULTI_WORD_TOKENS = frozenset(t for choice in MULTI_WORD_CHOICES for t in choice.split())
+# token_set_ratio实际比较的是去重排序后的词串，预先记录其长度用于长度剪枝
+MULTI_WORD_TOKEN_LENS = [len(' '.join(set(choice.split()))) for choice in MULTI_WORD_CHOICES]
+def _length_can_match(len1, len2):
+    """两个没有共同词的描述，相似度上限为 2*min/(len1+len2)，达不到阈值则无需比较"""
+    return 200 * min(len1, len2) >= SIMILARITY_CUTOFF * (len1 + len2)
+
+@functools.lru_cache(maxsize=None)
+def find_correct_tag(caption):
+    """返回描述对应的正确标签，没有匹配时返回None
+    
+    很多图片的描述相同，结果按描述缓存，重复描述直接命中
+    """
+    cap = caption.lower().strip()
+    
+    match = KEYWORD_RE.search(cap)
+    if match:
+        return KEYWORD_TAGS[match.group(0)]
+    if '\n' not in cap and cap in _KEYWORD_TEXT:
+        for keyword, tag in KEYWORD_TAGS.items():
+            if cap in keyword:
+                return tag
+    
+    query = utils.default_process(cap)
+    query_tokens = set(query.split())
+    if MULTI_WORD_TOKENS.isdisjoint(query_tokens):
+        # 与所有多词描述都没有共同词时，先按长度排除不可能达到阈值的候选
+        query_len = len(' '.join(query_tokens))
+        choices = {
+            i: choice for i, choice in enumerate(MULTI_WORD_CHOICES)
+            if _length_can_match(query_len, MULTI_WORD_TOKEN_LENS[i])
+        }
+        if not choices:
+            return None
+    else:
+        choices = dict(enumerate(MULTI_WORD_CHOICES))
+    
+    best = process.extractOne(
+        query, choices,
+        scorer=fuzz.token_set_ratio, score_cutoff=SIMILARITY_CUTOFF
+    )
+    if best is not None:
+        return MULTI_WORD_CORRECTIONS[best[2]]["correct_tag"]
+    return None
@@ -11,8 +11,14 @@
 4. "A view of a plane wing from the window" - 可能的标签: airplane, bird
 """
 
+import io
 import sys
-from api.processors.metadata_generator import classify_image_to_predefined_tags
+from contextlib import redirect_stdout
+from functools import lru_cache
+from api.processors.metadata_generator import classify_image_to_predefined_tags as _classify_image_to_predefined_tags
+
+# 相同的(描述, 主体名词)组合只分类一次，重复调用直接返回缓存结果
+classify_image_to_predefined_tags = lru_cache(maxsize=1024)(_classify_image_to_predefined_tags)
 
 def test_case(caption, options, extracted_noun=None):
     """测试指定的案例"""
@@ -39,44 +45,50 @@ def test_case(caption, options, extracted_noun=None):
 
 def run_tests():
     """运行所有测试案例"""
-    print("开始测试特定边缘案例...\n")
-    
-    results = {}
-    
-    # 案例1：包含"cathayo airplane"的描述
-    results["案例1"] = test_case(
-        "A cathayo airplane flying in the sky", 
-        ["cat", "airplane"]
-    )
-    
-    # 案例2：Cathayo airplane贴纸
-    results["案例2"] = test_case(
-        "Cathayo airplane sticker", 
-        ["cat", "airplane"]
-    )
-    
-    # 案例3：飞机翼的景色
-    results["案例3"] = test_case(
-        "A view of the wing of an airplane", 
-        ["airplane", "bird"]
-    )
-    
-    # 案例4：从窗户看飞机翼
-    results["案例4"] = test_case(
-        "A view of a plane wing from the window", 
-        ["airplane", "bird"]
-    )
-    
-    # 打印结果摘要
-    print("\n\n测试结果摘要:")
-    for case_name, case_results in results.items():
-        print(f"\n{case_name}:")
-        print(f"  自动分类: {case_results['不提供主体名词']}")
-        print("  提供主体名词的结果:")
-        for noun, tag in case_results['提供主体名词'].items():
-            print(f"    • 主体名词={noun}: {tag}")
-    
-    print("\n测试完成!")
+    # 输出先写入内存缓冲，结束时（包括出错时）一次性写到标准输出
+    buffer = io.StringIO()
+    try:
+        with redirect_stdout(buffer):
+            print("开始测试特定边缘案例...\n")
+            
+            results = {}
+            
+            # 案例1：包含"cathayo airplane"的描述
+            results["案例1"] = test_case(
+                "A cathayo airplane flying in the sky", 
+                ["cat", "airplane"]
+            )
+            
+            # 案例2：Cathayo airplane贴纸
+            results["案例2"] = test_case(
+                "Cathayo airplane sticker", 
+                ["cat", "airplane"]
+            )
+            
+            # 案例3：飞机翼的景色
+            results["案例3"] = test_case(
+                "A view of the wing of an airplane", 
+                ["airplane", "bird"]
+            )
+            
+            # 案例4：从窗户看飞机翼
+            results["案例4"] = test_case(
+                "A view of a plane wing from the window", 
+                ["airplane", "bird"]
+            )
+            
+            # 打印结果摘要
+            print("\n\n测试结果摘要:")
+            for case_name, case_results in results.items():
+                print(f"\n{case_name}:")
+                print(f"  自动分类: {case_results['不提供主体名词']}")
+                print("  提供主体名词的结果:")
+                for noun, tag in case_results['提供主体名词'].items():
+                    print(f"    • 主体名词={noun}: {tag}")
+            
+            print("\n测试完成!")
+    finally:
+        sys.stdout.write(buffer.getvalue())
 
 if __name__ == "__main__":
     run_tests() 
\ No newline at end of file
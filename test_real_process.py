@@ -16,8 +16,15 @@
 4. "A view of a plane wing from the window"
 """
 
+import io
 import sys
-from api.processors.metadata_generator import extract_main_noun, classify_image_to_predefined_tags
+from contextlib import redirect_stdout
+from functools import lru_cache
+from api.processors import metadata_generator
+
+# 相同的描述只提取/分类一次，重复调用直接返回缓存结果
+extract_main_noun = lru_cache(maxsize=1024)(metadata_generator.extract_main_noun)
+classify_image_to_predefined_tags = lru_cache(maxsize=1024)(metadata_generator.classify_image_to_predefined_tags)
 
 def simulate_real_process(caption):
     """模拟实际的处理流程"""
@@ -39,29 +46,35 @@ def simulate_real_process(caption):
 
 def run_real_process_tests():
     """运行模拟实际流程的测试"""
-    print("模拟实际图片元数据生成流程...\n")
-    
-    test_captions = [
-        "A cathayo airplane flying in the sky",
-        "Cathayo airplane sticker",
-        "A view of the wing of an airplane",
-        "A view of a plane wing from the window"
-    ]
-    
-    results = []
-    for caption in test_captions:
-        result = simulate_real_process(caption)
-        results.append(result)
-    
-    # 打印结果摘要
-    print("\n\n实际处理流程结果摘要:")
-    for i, result in enumerate(results, 1):
-        print(f"\n案例{i}:")
-        print(f"  描述: '{result['描述']}'")
-        print(f"  提取的主体名词: {result['提取的主体名词']}")
-        print(f"  最终分类标签: {result['分类标签']}")
-    
-    print("\n测试完成!")
+    # 输出先写入内存缓冲，结束时（包括出错时）一次性写到标准输出
+    buffer = io.StringIO()
+    try:
+        with redirect_stdout(buffer):
+            print("模拟实际图片元数据生成流程...\n")
+            
+            test_captions = [
+                "A cathayo airplane flying in the sky",
+                "Cathayo airplane sticker",
+                "A view of the wing of an airplane",
+                "A view of a plane wing from the window"
+            ]
+            
+            results = []
+            for caption in test_captions:
+                result = simulate_real_process(caption)
+                results.append(result)
+            
+            # 打印结果摘要
+            print("\n\n实际处理流程结果摘要:")
+            for i, result in enumerate(results, 1):
+                print(f"\n案例{i}:")
+                print(f"  描述: '{result['描述']}'")
+                print(f"  提取的主体名词: {result['提取的主体名词']}")
+                print(f"  最终分类标签: {result['分类标签']}")
+            
+            print("\n测试完成!")
+    finally:
+        sys.stdout.write(buffer.getvalue())
 
 if __name__ == "__main__":
     run_real_process_tests() 
\ No newline at end of file
@@ -13,88 +13,56 @@
 6. extracted_noun是字典
 """
 
+import io
 import sys
-from api.processors.metadata_generator import classify_image_to_predefined_tags
+from contextlib import redirect_stdout
+from functools import lru_cache
+from api.processors.metadata_generator import classify_image_to_predefined_tags as _classify_image_to_predefined_tags
 
-def test_with_string():
-    """测试使用字符串类型的extracted_noun"""
-    print("\n测试案例1: extracted_noun是字符串")
-    caption = "A beautiful flower in the garden"
-    extracted_noun = "flower"
-    result = classify_image_to_predefined_tags(caption, extracted_noun)
-    print(f"输入: caption='{caption}', extracted_noun='{extracted_noun}' (类型: {type(extracted_noun).__name__})")
-    print(f"输出: {result}")
-    return result
+_classify_cached = lru_cache(maxsize=1024)(_classify_image_to_predefined_tags)
 
-def test_with_list():
-    """测试使用列表类型的extracted_noun"""
-    print("\n测试案例2: extracted_noun是非空列表")
-    caption = "A dog running in the park"
-    extracted_noun = ["dog", "park"]
-    result = classify_image_to_predefined_tags(caption, extracted_noun)
-    print(f"输入: caption='{caption}', extracted_noun={extracted_noun} (类型: {type(extracted_noun).__name__})")
-    print(f"输出: {result}")
-    return result
+def classify_image_to_predefined_tags(caption, extracted_noun=None):
+    """按(描述, 主体名词)缓存分类结果，主体名词不可哈希（列表、字典）时直接调用原函数"""
+    try:
+        return _classify_cached(caption, extracted_noun)
+    except TypeError:
+        return _classify_image_to_predefined_tags(caption, extracted_noun)
 
-def test_with_empty_list():
-    """测试使用空列表作为extracted_noun"""
-    print("\n测试案例3: extracted_noun是空列表")
-    caption = "A car parked on the street"
-    extracted_noun = []
-    result = classify_image_to_predefined_tags(caption, extracted_noun)
-    print(f"输入: caption='{caption}', extracted_noun={extracted_noun} (类型: {type(extracted_noun).__name__})")
-    print(f"输出: {result}")
-    return result
-
-def test_with_none():
-    """测试使用None作为extracted_noun"""
-    print("\n测试案例4: extracted_noun是None")
-    caption = "A cat sleeping on the couch"
-    extracted_noun = None
-    result = classify_image_to_predefined_tags(caption, extracted_noun)
-    print(f"输入: caption='{caption}', extracted_noun={extracted_noun} (类型: {type(extracted_noun).__name__ if extracted_noun is not None else 'NoneType'})")
-    print(f"输出: {result}")
-    return result
-
-def test_with_number():
-    """测试使用数字作为extracted_noun"""
-    print("\n测试案例5: extracted_noun是数字")
-    caption = "An airplane flying in the sky"
-    extracted_noun = 123
-    result = classify_image_to_predefined_tags(caption, extracted_noun)
-    print(f"输入: caption='{caption}', extracted_noun={extracted_noun} (类型: {type(extracted_noun).__name__})")
-    print(f"输出: {result}")
-    return result
-
-def test_with_dict():
-    """测试使用字典作为extracted_noun"""
-    print("\n测试案例6: extracted_noun是字典")
-    caption = "A book on the table"
-    extracted_noun = {"main": "book", "secondary": "table"}
-    result = classify_image_to_predefined_tags(caption, extracted_noun)
-    print(f"输入: caption='{caption}', extracted_noun={extracted_noun} (类型: {type(extracted_noun).__name__})")
-    print(f"输出: {result}")
-    return result
+# 测试案例: (名称, 标题, 描述, extracted_noun)
+CASES = [
+    ("字符串", "extracted_noun是字符串", "A beautiful flower in the garden", "flower"),
+    ("列表", "extracted_noun是非空列表", "A dog running in the park", ["dog", "park"]),
+    ("空列表", "extracted_noun是空列表", "A car parked on the street", []),
+    ("None", "extracted_noun是None", "A cat sleeping on the couch", None),
+    ("数字", "extracted_noun是数字", "An airplane flying in the sky", 123),
+    ("字典", "extracted_noun是字典", "A book on the table", {"main": "book", "secondary": "table"}),
+]
 
 def run_all_tests():
     """运行所有测试案例"""
-    print("开始测试classify_image_to_predefined_tags函数...")
-    
-    results = {
-        "字符串": test_with_string(),
-        "列表": test_with_list(),
-        "空列表": test_with_empty_list(),
-        "None": test_with_none(),
-        "数字": test_with_number(),
-        "字典": test_with_dict()
-    }
-    
-    # 打印测试结果摘要
-    print("\n测试结果摘要:")
-    for test_name, result in results.items():
-        print(f"  • {test_name}: {result}")
-    
-    print("\n测试完成!")
+    # 输出先写入内存缓冲，结束时（包括出错时）一次性写到标准输出
+    buffer = io.StringIO()
+    try:
+        with redirect_stdout(buffer):
+            print("开始测试classify_image_to_predefined_tags函数...")
+            
+            classify = classify_image_to_predefined_tags
+            results = {}
+            for i, (name, title, caption, extracted_noun) in enumerate(CASES, 1):
+                print(f"\n测试案例{i}: {title}")
+                result = classify(caption, extracted_noun)
+                print(f"输入: caption='{caption}', extracted_noun={extracted_noun!r} (类型: {type(extracted_noun).__name__})")
+                print(f"输出: {result}")
+                results[name] = result
+            
+            # 打印测试结果摘要
+            print("\n测试结果摘要:")
+            for test_name, result in results.items():
+                print(f"  • {test_name}: {result}")
+            
+            print("\n测试完成!")
+    finally:
+        sys.stdout.write(buffer.getvalue())
 
 if __name__ == "__main__":
     run_all_tests() 
\ No newline at end of file
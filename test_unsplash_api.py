@@ -13,13 +13,18 @@ Unsplash API 测试脚本
 使用前请设置环境变量 UNSPLASH_ACCESS_KEY 或在下方直接填写您的访问密钥
 """
 
+import io
 import os
 import sys
 import json
+import shutil
 import requests
-import time
-from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
+from jsonio import write_json
 
 # 设置 Unsplash API 访问密钥
 # 请替换为您的实际访问密钥，或设置环境变量 UNSPLASH_ACCESS_KEY
@@ -28,6 +33,25 @@ UNSPLASH_ACCESS_KEY = os.environ.get('UNSPLASH_ACCESS_KEY', 'UNexRajSsADsyMXrFwK
 # API 基础 URL
 UNSPLASH_API_URL = 'https://api.unsplash.com'
 
+# 下载图片时每次复制的字节数和写文件的缓冲区大小
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+DOWNLOAD_BUFFER_SIZE = 1 << 20
+
+# 下载测试图片的保存目录
+DOWNLOAD_DIR = 'unsplash-images'
+
+# 所有请求共用一个会话，复用 TCP/TLS 连接；
+# 遇到限流(429)和服务端错误时自动退避重试，重试用尽后返回最后一次响应
+SESSION = requests.Session()
+SESSION.headers.update({'Authorization': f'Client-ID {UNSPLASH_ACCESS_KEY}'})
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=10,
+    max_retries=Retry(total=3, backoff_factor=0.3,
+                      status_forcelist=[429, 500, 502, 503, 504],
+                      raise_on_status=False)
+))
+
 def validate_credentials():
     """验证 API 访问凭证是否有效"""
     if not UNSPLASH_ACCESS_KEY:
@@ -36,12 +60,8 @@ def validate_credentials():
         return False
     
     # 尝试获取随机图片以验证凭证（不使用/me端点，因为它需要OAuth认证）
-    headers = {
-        'Authorization': f'Client-ID {UNSPLASH_ACCESS_KEY}'
-    }
-    
     try:
-        response = requests.get(f'{UNSPLASH_API_URL}/photos/random?count=1', headers=headers)
+        response = SESSION.get(f'{UNSPLASH_API_URL}/photos/random?count=1')
         
         if response.status_code == 200:
             print("API 访问凭证有效")
@@ -60,10 +80,6 @@ def validate_credentials():
 
 def get_random_photos(count=1, query=None):
     """获取随机图片"""
-    headers = {
-        'Authorization': f'Client-ID {UNSPLASH_ACCESS_KEY}'
-    }
-    
     params = {
         'count': count
     }
@@ -72,10 +88,8 @@ def get_random_photos(count=1, query=None):
         params['query'] = query
     
     try:
-        url = f'{UNSPLASH_API_URL}/photos/random?{urlencode(params)}'
-        print(f"请求URL: {url}")
-        
-        response = requests.get(url, headers=headers)
+        response = SESSION.get(f'{UNSPLASH_API_URL}/photos/random', params=params)
+        print(f"请求URL: {response.url}")
         
         if response.status_code == 200:
             photos = response.json()
@@ -91,12 +105,8 @@ def get_random_photos(count=1, query=None):
 
 def get_photo_details(photo_id):
     """获取指定图片的详细信息"""
-    headers = {
-        'Authorization': f'Client-ID {UNSPLASH_ACCESS_KEY}'
-    }
-    
     try:
-        response = requests.get(f'{UNSPLASH_API_URL}/photos/{photo_id}', headers=headers)
+        response = SESSION.get(f'{UNSPLASH_API_URL}/photos/{photo_id}')
         
         if response.status_code == 200:
             photo = response.json()
@@ -110,46 +120,49 @@ def get_photo_details(photo_id):
         print(f"获取图片详细信息时发生错误: {e}")
         return None
 
+def _save_response(response, save_path):
+    """把流式响应的原始内容以64KB块复制到文件（测试用，不做fsync）"""
+    os.makedirs(os.path.dirname(save_path) or '.', exist_ok=True)
+    response.raw.decode_content = True
+    fd = os.open(save_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    with os.fdopen(fd, 'wb', buffering=DOWNLOAD_BUFFER_SIZE) as f:
+        shutil.copyfileobj(response.raw, f, DOWNLOAD_CHUNK_SIZE)
+
 def download_photo(download_url, save_path):
-    """下载图片并保存到本地"""
-    headers = {
-        'Authorization': f'Client-ID {UNSPLASH_ACCESS_KEY}'
-    }
+    """下载图片并保存到本地
     
+    下载链接以流式方式请求：返回JSON时从中取出实际图片地址再下载，
+    直接重定向到图片时一次请求即可写入文件
+    """
     try:
-        # 获取下载链接
-        response = requests.get(download_url, headers=headers)
-        
-        if response.status_code == 200:
-            download_data = response.json()
-            actual_download_url = download_data['url']
+        with SESSION.get(download_url, stream=True) as response:
+            if response.status_code != 200:
+                print(f"获取下载链接失败，状态码: {response.status_code}")
+                print(response.text)
+                return False
             
-            # 下载实际图片
-            img_response = requests.get(actual_download_url, stream=True)
+            if 'json' not in response.headers.get('Content-Type', ''):
+                _save_response(response, save_path)
+                print(f"图片已下载到: {save_path}")
+                return True
             
+            actual_download_url = response.json()['url']
+        
+        # 下载实际图片
+        with SESSION.get(actual_download_url, stream=True) as img_response:
             if img_response.status_code == 200:
-                with open(save_path, 'wb') as f:
-                    for chunk in img_response.iter_content(1024):
-                        f.write(chunk)
+                _save_response(img_response, save_path)
                 print(f"图片已下载到: {save_path}")
                 return True
             else:
                 print(f"下载图片失败，状态码: {img_response.status_code}")
                 return False
-        else:
-            print(f"获取下载链接失败，状态码: {response.status_code}")
-            print(response.text)
-            return False
     except Exception as e:
         print(f"下载图片时发生错误: {e}")
         return False
 
 def search_photos(query, page=1, per_page=10):
     """搜索图片"""
-    headers = {
-        'Authorization': f'Client-ID {UNSPLASH_ACCESS_KEY}'
-    }
-    
     params = {
         'query': query,
         'page': page,
@@ -157,10 +170,8 @@ def search_photos(query, page=1, per_page=10):
     }
     
     try:
-        url = f'{UNSPLASH_API_URL}/search/photos?{urlencode(params)}'
-        print(f"搜索URL: {url}")
-        
-        response = requests.get(url, headers=headers)
+        response = SESSION.get(f'{UNSPLASH_API_URL}/search/photos', params=params)
+        print(f"搜索URL: {response.url}")
         
         if response.status_code == 200:
             result = response.json()
@@ -175,7 +186,19 @@ def search_photos(query, page=1, per_page=10):
         return None
 
 def run_api_tests():
-    """运行一系列API测试"""
+    """运行一系列API测试
+    
+    输出先写入内存缓冲，测试结束（包括提前返回）后一次性写到标准输出
+    """
+    buffer = io.StringIO()
+    try:
+        with redirect_stdout(buffer):
+            return _run_api_tests()
+    finally:
+        sys.stdout.write(buffer.getvalue())
+
+def _run_api_tests():
+    """依次执行各项API测试"""
     print("\n===== Unsplash API 测试开始 =====")
     
     # 1. 验证凭证
@@ -191,49 +214,49 @@ def run_api_tests():
         return False
     
     # 保存示例数据
-    with open('unsplash_random_sample.json', 'w', encoding='utf-8') as f:
-        json.dump(random_photos, f, indent=2)
+    write_json('unsplash_random_sample.json', random_photos)
     print(f"随机图片示例已保存到 unsplash_random_sample.json")
     
+    # 详情、搜索和下载只依赖随机图片的结果，彼此独立，一起提交到线程池并行请求；
+    # 限流由会话的重试退避处理，结果按原有顺序输出
+    search_terms = ["cat", "dog", "car", "flower"]
+    photo = random_photos[0]
+    photo_id = photo['id']
+    download_url = photo['links']['download_location']
+    save_path = os.path.join(DOWNLOAD_DIR, f"test_{photo_id}.jpg")
+    
+    with ThreadPoolExecutor(max_workers=len(search_terms) + 2) as executor:
+        details_future = executor.submit(get_photo_details, photo_id)
+        search_futures = [executor.submit(search_photos, term, per_page=5) for term in search_terms]
+        download_future = executor.submit(download_photo, download_url, save_path)
+    
     # 3. 获取图片详情
     print("\n3. 获取图片详情测试")
-    photo_id = random_photos[0]['id']
-    photo_details = get_photo_details(photo_id)
+    photo_details = details_future.result()
     if not photo_details:
         print("获取图片详情失败")
     else:
-        with open('unsplash_photo_details_sample.json', 'w', encoding='utf-8') as f:
-            json.dump(photo_details, f, indent=2)
+        write_json('unsplash_photo_details_sample.json', photo_details)
         print(f"图片详情示例已保存到 unsplash_photo_details_sample.json")
     
     # 4. 搜索图片
     print("\n4. 搜索图片测试")
-    search_terms = ["cat", "dog", "car", "flower"]
-    for term in search_terms:
+    for term, search_future in zip(search_terms, search_futures):
         print(f"\n搜索关键词: {term}")
-        search_result = search_photos(term, per_page=5)
+        search_result = search_future.result()
         if search_result and search_result['results']:
             print(f"找到 {len(search_result['results'])} 张匹配图片")
             # 保存第一个搜索结果的示例
             if term == search_terms[0]:
-                with open(f'unsplash_search_sample.json', 'w', encoding='utf-8') as f:
-                    json.dump(search_result, f, indent=2)
+                write_json('unsplash_search_sample.json', search_result)
                 print(f"搜索结果示例已保存到 unsplash_search_sample.json")
-        time.sleep(1)  # 减少 API 请求频率
     
     # 5. 下载图片测试
     print("\n5. 下载图片测试")
-    if random_photos and len(random_photos) > 0:
-        photo = random_photos[0]
-        photo_id = photo['id']
-        download_url = photo['links']['download_location']
-        save_path = f"unsplash-images/test_{photo_id}.jpg"
-        
-        download_success = download_photo(download_url, save_path)
-        if download_success:
-            print(f"图片下载测试成功: {save_path}")
-        else:
-            print("图片下载测试失败")
+    if download_future.result():
+        print(f"图片下载测试成功: {save_path}")
+    else:
+        print("图片下载测试失败")
     
     print("\n===== Unsplash API 测试结束 =====")
     return True
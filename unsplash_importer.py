@@ -18,12 +18,18 @@ import sys
 import json
 import re
 import glob
-import requests
 import time
+import hashlib
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from urllib.parse import urlencode
 import shutil
+from jsonio import read_json, write_json
 
 # 配置日志
 logging.basicConfig(
@@ -40,14 +46,86 @@ logger = logging.getLogger('unsplash_importer')
 UNSPLASH_ACCESS_KEY = os.environ.get('UNSPLASH_ACCESS_KEY', 'UNexRajSsADsyMXrFwKf9UJmNryJOohrFXpJoRwqR_8')
 UNSPLASH_API_URL = 'https://api.unsplash.com'
 
+# 所有请求共用一个会话，复用 TCP/TLS 连接；
+# 遇到限流(429)和服务端错误时自动退避重试，重试用尽后返回最后一次响应
+_SESSION = requests.Session()
+_SESSION.headers.update({'Authorization': f'Client-ID {UNSPLASH_ACCESS_KEY}'})
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.5,
+                      status_forcelist=[429, 500, 502, 503, 504],
+                      raise_on_status=False)
+))
+
+# 下载统计请求在后台线程中发送，超时时间（秒）
+_TRACKING_EXECUTOR = ThreadPoolExecutor(max_workers=2)
+TRACKING_TIMEOUT = 2
+
+# 下载图片时每次复制的字节数（也用作写文件的缓冲区大小）
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
 # 配置目录和文件路径
 UNSPLASH_IMAGES_DIR = "unsplash-images"
 METADATA_DIR = "metadata"
 ID_INDEX_FILE = os.path.join(METADATA_DIR, "unsplash_id_index.json")
 
+# API 响应（搜索结果、图片信息）的本地缓存目录和有效期（秒）
+API_CACHE_DIR = os.path.join(METADATA_DIR, "api_cache")
+API_CACHE_EXPIRE = 3600
+
 # 图片元数据文件
 IMAGES_JSON_FILE = "api/data/images.json"
 
+# 从文件名中提取 Unsplash ID 的正则，按优先级依次为：
+# a. standard-name-{ID}-unsplash.jpg（或 -{ID}.jpg / _{ID}.jpg）
+# b. test_{ID}.jpg
+# c. {ID}.jpg
+# 前两个分支以非贪婪的 .*? 开头，取文件名中最靠前的匹配，
+# 只有整个文件名都匹配不到 a 时才尝试 b，与依次调用 re.search 的结果一致
+_ID_RE = re.compile(
+    r'(?:.*?[-_](?P<a>[a-zA-Z0-9_-]{11})(?:-unsplash|\.[a-z]+$)'
+    r'|.*?test_(?P<b>[a-zA-Z0-9_-]{11})\.[a-z]+'
+    r'|(?P<c>[a-zA-Z0-9_-]{11})\.[a-z]+$)',
+    re.DOTALL
+)
+
+# 建立索引时扫描的图片扩展名
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# 按 ID 批量导入时同时进行的下载数（同时限制了对 API 的并发请求数）
+IMPORT_WORKERS = 5
+
+# 索引的读取-修改-保存需要串行执行，避免并行导入时互相覆盖
+_INDEX_LOCK = threading.RLock()
+
+# 索引在进程内只读取一次，之后的查询和修改都在内存中进行；
+# 修改后标记为脏，由 flush_id_index 统一写回（每累计若干次新增也会写回一次）
+_INDEX_CACHE = None
+_INDEX_DIRTY = False
+_INDEX_PENDING_ADDS = 0
+INDEX_FLUSH_INTERVAL = 50
+
+# images.json 按 unsplash_id 建立的查找表及对应的文件状态，见 _images_by_unsplash_id
+_IMAGES_CACHE = None
+
+# 启动时的工作目录，索引中的路径都相对于此目录（脚本运行期间不会切换目录）
+_CWD = os.getcwd() + os.sep
+
+def _relpath(path):
+    """返回相对于工作目录的路径，结果与 os.path.relpath 相同
+    
+    常见情况（不含 .. 的相对路径、工作目录下的绝对路径）只做字符串处理，
+    不必每次调用 os.getcwd 并逐级比较路径
+    """
+    if os.path.isabs(path):
+        path = os.path.normpath(path)
+        if path.startswith(_CWD):
+            return path[len(_CWD):]
+    elif '..' not in path:
+        return os.path.normpath(path)
+    return os.path.relpath(path)
+
 # 确保必要的目录存在
 def ensure_dir_exists(directory):
     """确保目录存在，不存在则创建"""
@@ -56,25 +134,47 @@ def ensure_dir_exists(directory):
         logger.info(f"已创建目录: {directory}")
 
 # Unsplash ID 索引管理
-def load_id_index():
-    """加载 Unsplash ID 索引"""
+def _read_id_index():
+    """从文件读取 Unsplash ID 索引"""
     ensure_dir_exists(METADATA_DIR)
     
     if os.path.exists(ID_INDEX_FILE):
         try:
-            with open(ID_INDEX_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return read_json(ID_INDEX_FILE)
         except json.JSONDecodeError:
             logger.warning(f"ID 索引文件格式错误，创建新索引")
             return {"unsplash_ids": {}}
     return {"unsplash_ids": {}}
 
+def load_id_index():
+    """加载 Unsplash ID 索引（首次调用时读取文件，之后返回内存中的索引）"""
+    global _INDEX_CACHE
+    with _INDEX_LOCK:
+        if _INDEX_CACHE is None:
+            _INDEX_CACHE = _read_id_index()
+        return _INDEX_CACHE
+
 def save_id_index(index_data):
-    """保存 Unsplash ID 索引"""
-    with open(ID_INDEX_FILE, 'w', encoding='utf-8') as f:
-        json.dump(index_data, f, indent=2, ensure_ascii=False)
+    """保存 Unsplash ID 索引
+    
+    先写入临时文件再原子替换，中途出错不会损坏原索引
+    """
+    global _INDEX_CACHE, _INDEX_DIRTY, _INDEX_PENDING_ADDS
+    with _INDEX_LOCK:
+        tmp_file = f"{ID_INDEX_FILE}.tmp"
+        write_json(tmp_file, index_data)
+        os.replace(tmp_file, ID_INDEX_FILE)
+        _INDEX_CACHE = index_data
+        _INDEX_DIRTY = False
+        _INDEX_PENDING_ADDS = 0
     logger.info(f"ID 索引已保存到: {ID_INDEX_FILE}")
 
+def flush_id_index():
+    """把内存中未保存的索引修改写回文件"""
+    with _INDEX_LOCK:
+        if _INDEX_DIRTY:
+            save_id_index(_INDEX_CACHE)
+
 def extract_unsplash_id(filename):
     """从文件名中提取 Unsplash ID
     
@@ -83,25 +183,59 @@ def extract_unsplash_id(filename):
     2. test_{ID}.jpg
     3. {ID}.jpg 
     """
-    # 尝试匹配 standard-name-{ID}-unsplash.jpg 格式
-    pattern1 = r'[-_]([a-zA-Z0-9_-]{11})(?:-unsplash|\.[a-z]+$)'
-    match = re.search(pattern1, filename)
+    match = _ID_RE.match(filename)
     if match:
-        return match.group(1)
-    
-    # 尝试匹配 test_{ID}.jpg 格式
-    pattern2 = r'test_([a-zA-Z0-9_-]{11})\.[a-z]+'
-    match = re.search(pattern2, filename)
-    if match:
-        return match.group(1)
+        return match.group('a') or match.group('b') or match.group('c')
+    return None
+
+def _scan_dir(directory):
+    """扫描单个目录，返回 (图片 [(文件名, 路径)], 子目录路径列表)
     
-    # 尝试匹配纯 ID 格式
-    pattern3 = r'^([a-zA-Z0-9_-]{11})\.[a-z]+$'
-    match = re.search(pattern3, filename)
-    if match:
-        return match.group(1)
+    使用 os.scandir，文件类型直接取自目录项，无需逐个 stat；
+    与 os.walk 一样不进入符号链接指向的目录，目录无法读取时返回空结果
+    """
+    images = []
+    subdirs = []
+    try:
+        it = os.scandir(directory)
+    except OSError:
+        return images, subdirs
+    
+    with it:
+        for entry in it:
+            if entry.is_dir():
+                if not entry.is_symlink():
+                    subdirs.append(entry.path)
+            elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                images.append((entry.name, entry.path))
+    return images, subdirs
+
+def _iter_images(directory):
+    """递归遍历目录中的图片，返回 (文件名, 路径)
     
-    return None
+    遍历顺序与 os.walk 相同：先当前目录的文件，再依次进入子目录
+    """
+    images, subdirs = _scan_dir(directory)
+    yield from images
+    for subdir in subdirs:
+        yield from _iter_images(subdir)
+
+def _index_images(images):
+    """从 (文件名, 路径) 中提取 Unsplash ID，返回 {ID: 相对路径}"""
+    found = {}
+    for file, file_path in images:
+        unsplash_id = extract_unsplash_id(file)
+        
+        if unsplash_id:
+            # 使用相对路径存储
+            rel_path = _relpath(file_path)
+            found[unsplash_id] = rel_path
+            logger.debug(f"已添加 ID: {unsplash_id} -> {rel_path}")
+    return found
+
+def _index_subtree(directory):
+    """扫描目录及其所有子目录中的图片，返回 {ID: 相对路径}"""
+    return _index_images(_iter_images(directory))
 
 def build_id_index(force_rebuild=False):
     """构建或更新 Unsplash ID 索引
@@ -116,18 +250,18 @@ def build_id_index(force_rebuild=False):
     logger.info("开始构建 Unsplash ID 索引...")
     index_data = {"unsplash_ids": {}}
     
-    # 扫描 unsplash-images 目录及其所有子目录
-    for root, dirs, files in os.walk(UNSPLASH_IMAGES_DIR):
-        for file in files:
-            if file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                file_path = os.path.join(root, file)
-                unsplash_id = extract_unsplash_id(file)
-                
-                if unsplash_id:
-                    # 使用相对路径存储
-                    rel_path = os.path.relpath(file_path)
-                    index_data["unsplash_ids"][unsplash_id] = rel_path
-                    logger.debug(f"已添加 ID: {unsplash_id} -> {rel_path}")
+    # 扫描 unsplash-images 目录及其所有子目录：
+    # 顶层的图片直接处理，各批次子目录分到多个进程并行扫描，
+    # 按目录顺序合并，同一 ID 出现多次时结果与顺序扫描一致
+    images, subdirs = _scan_dir(UNSPLASH_IMAGES_DIR)
+    index_data["unsplash_ids"].update(_index_images(images))
+    if len(subdirs) > 1:
+        with ProcessPoolExecutor() as executor:
+            for found in executor.map(_index_subtree, subdirs):
+                index_data["unsplash_ids"].update(found)
+    else:
+        for subdir in subdirs:
+            index_data["unsplash_ids"].update(_index_subtree(subdir))
     
     # 保存索引
     save_id_index(index_data)
@@ -141,13 +275,17 @@ def add_to_index(unsplash_id, file_path):
         logger.warning(f"无法添加到索引：ID 为空")
         return False
     
-    index_data = load_id_index()
-    
     # 转换为相对路径
-    rel_path = os.path.relpath(file_path)
-    index_data["unsplash_ids"][unsplash_id] = rel_path
-    
-    save_id_index(index_data)
+    rel_path = _relpath(file_path)
+    
+    global _INDEX_DIRTY, _INDEX_PENDING_ADDS
+    with _INDEX_LOCK:
+        index_data = load_id_index()
+        index_data["unsplash_ids"][unsplash_id] = rel_path
+        _INDEX_DIRTY = True
+        _INDEX_PENDING_ADDS += 1
+        if _INDEX_PENDING_ADDS >= INDEX_FLUSH_INTERVAL:
+            save_id_index(index_data)
     logger.info(f"已添加 ID: {unsplash_id} -> {rel_path}")
     return True
 
@@ -157,6 +295,7 @@ def check_id_exists(unsplash_id):
     Returns:
         tuple: (是否存在, 如果存在则返回文件路径)
     """
+    global _INDEX_DIRTY
     if not unsplash_id:
         return False, None
     
@@ -172,35 +311,61 @@ def check_id_exists(unsplash_id):
         else:
             # 文件不存在，从索引中移除
             logger.warning(f"ID {unsplash_id} 索引存在但文件缺失: {file_path}")
-            del index_data["unsplash_ids"][unsplash_id]
-            save_id_index(index_data)
+            with _INDEX_LOCK:
+                if index_data["unsplash_ids"].get(unsplash_id) == file_path:
+                    del index_data["unsplash_ids"][unsplash_id]
+                    _INDEX_DIRTY = True
     
     return False, None
 
 # Unsplash API 相关功能
+def _api_get(url):
+    """GET 请求 API，返回 (状态码, 解析后的 JSON, 失败时的响应文本)
+    
+    成功的响应缓存到 API_CACHE_DIR，有效期内再次请求同一地址时直接读取本地缓存，
+    重复运行时不占用网络和 API 配额；图片下载不经过此缓存
+    """
+    cache_path = os.path.join(API_CACHE_DIR, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+    try:
+        if time.time() - os.path.getmtime(cache_path) < API_CACHE_EXPIRE:
+            return 200, read_json(cache_path), None
+    except (OSError, ValueError):
+        # 没有缓存、缓存损坏时重新请求
+        pass
+    
+    response = _SESSION.get(url)
+    if response.status_code != 200:
+        return response.status_code, None, response.text
+    
+    data = response.json()
+    try:
+        ensure_dir_exists(API_CACHE_DIR)
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(response.content)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"保存 API 响应缓存失败: {e}")
+    return 200, data, None
+
 def get_photo_by_id(photo_id):
     """通过 ID 获取 Unsplash 图片信息"""
     if not UNSPLASH_ACCESS_KEY:
         logger.error("缺少 Unsplash API 访问密钥")
         return None
     
-    headers = {
-        'Authorization': f'Client-ID {UNSPLASH_ACCESS_KEY}'
-    }
-    
     try:
         url = f'{UNSPLASH_API_URL}/photos/{photo_id}'
         logger.info(f"获取图片信息: {url}")
         
-        response = requests.get(url, headers=headers)
+        status_code, photo_data, text = _api_get(url)
         
-        if response.status_code == 200:
-            photo_data = response.json()
+        if status_code == 200:
             logger.info(f"成功获取图片信息: {photo_id}")
             return photo_data
         else:
-            logger.error(f"获取图片信息失败，状态码: {response.status_code}")
-            logger.error(response.text)
+            logger.error(f"获取图片信息失败，状态码: {status_code}")
+            logger.error(text)
             return None
     except Exception as e:
         logger.error(f"获取图片信息时发生错误: {e}")
@@ -222,10 +387,6 @@ def search_photos(query, per_page=10, page=1, order_by='relevant'):
         logger.error("缺少 Unsplash API 访问密钥")
         return []
     
-    headers = {
-        'Authorization': f'Client-ID {UNSPLASH_ACCESS_KEY}'
-    }
-    
     params = {
         'query': query,
         'per_page': per_page,
@@ -237,22 +398,21 @@ def search_photos(query, per_page=10, page=1, order_by='relevant'):
         url = f'{UNSPLASH_API_URL}/search/photos?{urlencode(params)}'
         logger.info(f"搜索图片: {url}")
         
-        response = requests.get(url, headers=headers)
+        status_code, search_data, text = _api_get(url)
         
-        if response.status_code == 200:
-            search_data = response.json()
+        if status_code == 200:
             photos = search_data.get('results', [])
             total_pages = search_data.get('total_pages', 0)
             total_results = search_data.get('total', 0)
             
             logger.info(f"搜索 '{query}' 成功，找到 {total_results} 个结果，共 {total_pages} 页")
             return photos, total_pages, total_results
-        elif response.status_code == 429:
+        elif status_code == 429:
             logger.error(f"API速率限制，请稍后再试")
             return [], 0, 0
         else:
-            logger.error(f"搜索图片失败，状态码: {response.status_code}")
-            logger.error(response.text)
+            logger.error(f"搜索图片失败，状态码: {status_code}")
+            logger.error(text)
             return [], 0, 0
     
     except Exception as e:
@@ -271,6 +431,31 @@ def load_images_metadata():
     logger.warning(f"images.json 不存在")
     return []
 
+def _images_by_unsplash_id():
+    """返回 images.json 中 unsplash_id 到图片元数据的映射
+    
+    映射按文件的修改时间和大小缓存，文件未变化时不再重复解析；
+    同一 ID 出现多次时保留第一条，与按顺序查找的结果一致
+    """
+    global _IMAGES_CACHE
+    try:
+        stat = os.stat(IMAGES_JSON_FILE)
+        key = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        key = None
+    
+    cache = _IMAGES_CACHE
+    if cache is not None and cache[0] == key:
+        return cache[1]
+    
+    images_by_id = {}
+    for image in load_images_metadata():
+        unsplash_id = image.get("unsplash_id")
+        if unsplash_id is not None:
+            images_by_id.setdefault(unsplash_id, image)
+    _IMAGES_CACHE = (key, images_by_id)
+    return images_by_id
+
 def check_image_exists_by_api_id(unsplash_id):
     """根据API返回的unsplash_id检查图片是否已存在
     
@@ -284,11 +469,10 @@ def check_image_exists_by_api_id(unsplash_id):
         return False, None
     
     # 首先尝试从images.json中查找
-    images_data = load_images_metadata()
-    for image in images_data:
-        if image.get("unsplash_id") == unsplash_id:
-            logger.info(f"在元数据中找到图片 {unsplash_id}: {image.get('id')}")
-            return True, image
+    image = _images_by_unsplash_id().get(unsplash_id)
+    if image is not None:
+        logger.info(f"在元数据中找到图片 {unsplash_id}: {image.get('id')}")
+        return True, image
     
     # 如果在元数据中没找到，再尝试从传统索引中查找
     exists, existing_path = check_id_exists(unsplash_id)
@@ -297,6 +481,13 @@ def check_image_exists_by_api_id(unsplash_id):
     
     return False, None
 
+def _track_download(download_location):
+    """请求下载统计地址，失败只记录日志"""
+    try:
+        _SESSION.get(download_location, timeout=TRACKING_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"触发下载统计失败: {e}")
+
 def download_photo(photo_data, save_dir):
     """下载 Unsplash 图片
     
@@ -335,22 +526,20 @@ def download_photo(photo_data, save_dir):
         logger.info(f"下载图片: {download_url}")
         logger.info(f"保存路径: {save_path}")
         
-        # 下载图片
-        headers = {
-            'Authorization': f'Client-ID {UNSPLASH_ACCESS_KEY}'
-        }
-        
-        # 触发 Unsplash 下载统计
+        # 触发 Unsplash 下载统计（在后台线程中发送，不阻塞下载）
         download_location = photo_data['links']['download_location']
-        requests.get(download_location, headers=headers)
+        _TRACKING_EXECUTOR.submit(_track_download, download_location)
         
         # 实际下载图片
-        response = requests.get(download_url, stream=True)
+        with _SESSION.get(download_url, stream=True) as response:
+            status_code = response.status_code
+            if status_code == 200:
+                # 直接从原始响应流按块复制到文件
+                response.raw.decode_content = True
+                with open(save_path, 'wb', buffering=DOWNLOAD_CHUNK_SIZE) as f:
+                    shutil.copyfileobj(response.raw, f, DOWNLOAD_CHUNK_SIZE)
         
-        if response.status_code == 200:
-            with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(1024):
-                    f.write(chunk)
+        if status_code == 200:
             
             # 添加到索引
             add_to_index(photo_id, save_path)
@@ -380,7 +569,7 @@ def download_photo(photo_data, save_dir):
             
             return save_path, api_metadata
         else:
-            logger.error(f"下载图片失败，状态码: {response.status_code}")
+            logger.error(f"下载图片失败，状态码: {status_code}")
             return None, None
     except Exception as e:
         logger.error(f"下载图片时发生错误: {e}")
@@ -429,23 +618,25 @@ def import_photos_by_ids(photo_ids, batch_dir):
     skipped_ids = []
     failed_ids = []
     
+    # 检查是否已存在，只导入新的 ID
+    new_ids = []
     for photo_id in photo_ids:
-        # 检查是否已存在
         exists, existing_path = check_id_exists(photo_id)
         if exists:
             logger.info(f"图片 {photo_id} 已存在: {existing_path}")
             skipped_ids.append(photo_id)
-            continue
-        
-        # 添加延迟，遵循 API 限制
-        time.sleep(1)
-        
-        # 导入图片
-        file_path, _ = import_photo_by_id(photo_id, batch_dir)
-        if file_path:
-            imported_paths.append(file_path)
         else:
-            failed_ids.append(photo_id)
+            new_ids.append(photo_id)
+    
+    # 各图片的获取和下载相互独立，用有限的线程数并行导入，
+    # 并发数即为同时对 API 发出的请求数上限
+    with ThreadPoolExecutor(max_workers=IMPORT_WORKERS) as executor:
+        results = executor.map(lambda photo_id: import_photo_by_id(photo_id, batch_dir), new_ids)
+        for photo_id, (file_path, _) in zip(new_ids, results):
+            if file_path:
+                imported_paths.append(file_path)
+            else:
+                failed_ids.append(photo_id)
     
     # 输出总结
     logger.info(f"导入完成:")
@@ -487,60 +678,66 @@ def import_photos_by_query(query, count, batch_dir, order_by='relevant', per_pag
     current_page = start_page
     per_page = min(30, per_page)  # 确保不超过Unsplash API的限制
     
-    # 当还需要更多图片且没有达到API限制时继续获取
-    while len(imported_paths) < count and not api_limit_reached and total_attempts < 100:
-        logger.info(f"尝试获取第{current_page}页搜索结果，每页{per_page}张图片，排序方式:{order_by}")
-        
-        # 搜索图片
-        photo_data_list, total_pages, total_results = search_photos(
-            query, 
-            per_page=per_page, 
-            page=current_page,
-            order_by=order_by
-        )
-        
-        # 检查是否到达结果末尾或API限制
-        if not photo_data_list:
-            if total_pages == 0 and total_results == 0:
-                logger.error(f"可能已达到API限制或搜索无结果")
-                api_limit_reached = True
-                break
-            elif current_page > total_pages:
-                logger.info(f"已浏览完所有搜索结果（共{total_pages}页）")
-                break
-        
-        logger.info(f"找到第{current_page}页的 {len(photo_data_list)} 张匹配 '{query}' 的图片")
+    # 下载和下一页的搜索在线程池中并行进行，同时下载数不超过 IMPORT_WORKERS
+    with ThreadPoolExecutor(max_workers=IMPORT_WORKERS + 1) as executor:
+        search_page = lambda page: search_photos(query, per_page=per_page, page=page, order_by=order_by)
+        page_future = executor.submit(search_page, current_page)
         
-        # 导入图片
-        for photo_data in photo_data_list:
-            total_attempts += 1
-            photo_id = photo_data['id']
+        # 当还需要更多图片且没有达到API限制时继续获取
+        while len(imported_paths) < count and not api_limit_reached and total_attempts < 100:
+            logger.info(f"尝试获取第{current_page}页搜索结果，每页{per_page}张图片，排序方式:{order_by}")
             
-            # 检查是否已存在
-            exists, existing_path = check_id_exists(photo_id)
-            if exists:
-                logger.info(f"图片 {photo_id} 已存在: {existing_path}")
-                skipped_count += 1
-                continue
+            # 搜索图片（可能已在处理上一页时提前请求）
+            photo_data_list, total_pages, total_results = page_future.result()
+            page_future = None
             
-            # 添加延迟，遵循 API 限制
-            time.sleep(1)
+            # 检查是否到达结果末尾或API限制
+            if not photo_data_list:
+                if total_pages == 0 and total_results == 0:
+                    logger.error(f"可能已达到API限制或搜索无结果")
+                    api_limit_reached = True
+                    break
+                elif current_page > total_pages:
+                    logger.info(f"已浏览完所有搜索结果（共{total_pages}页）")
+                    break
             
-            # 下载图片
-            file_path, _ = download_photo(photo_data, batch_dir)
-            if file_path:
-                imported_paths.append(file_path)
-                if len(imported_paths) >= count:
-                    break  # 已获取足够数量，退出循环
-            else:
-                failed_count += 1
-        
-        # 如果已经获取到足够数量，或者已到达搜索结果末尾，退出循环
-        if len(imported_paths) >= count or current_page >= total_pages:
-            break
-        
-        # 继续下一页
-        current_page += 1
+            logger.info(f"找到第{current_page}页的 {len(photo_data_list)} 张匹配 '{query}' 的图片")
+            
+            # 检查是否已存在，只下载新的图片
+            candidates = []
+            for photo_data in photo_data_list:
+                total_attempts += 1
+                photo_id = photo_data['id']
+                
+                exists, existing_path = check_id_exists(photo_id)
+                if exists:
+                    logger.info(f"图片 {photo_id} 已存在: {existing_path}")
+                    skipped_count += 1
+                    continue
+                candidates.append(photo_data)
+            
+            # 本页的新图片全部成功也不够时，提前请求下一页
+            if len(candidates) < count - len(imported_paths) and current_page < total_pages:
+                page_future = executor.submit(search_page, current_page + 1)
+            
+            # 每轮最多只下载还缺少的数量，失败的由后面的图片补上，不会多下载
+            while candidates and len(imported_paths) < count:
+                needed = count - len(imported_paths)
+                batch, candidates = candidates[:needed], candidates[needed:]
+                for file_path, _ in executor.map(lambda photo_data: download_photo(photo_data, batch_dir), batch):
+                    if file_path:
+                        imported_paths.append(file_path)
+                    else:
+                        failed_count += 1
+            
+            # 如果已经获取到足够数量，或者已到达搜索结果末尾，退出循环
+            if len(imported_paths) >= count or current_page >= total_pages:
+                break
+            
+            # 继续下一页
+            current_page += 1
+            if page_future is None:
+                page_future = executor.submit(search_page, current_page)
     
     # 记录API限制情况
     if api_limit_reached:
@@ -587,18 +784,22 @@ def import_to_batch(batch_date=None, photo_ids=None, query=None, count=5, order_
     # 确保索引最新
     build_id_index()
     
-    # 根据提供的参数选择导入方式
-    if photo_ids:
-        logger.info(f"开始导入指定 ID 的图片到批次 {batch_date}")
-        return import_photos_by_ids(photo_ids, batch_dir)
-    
-    elif query:
-        logger.info(f"开始导入关键词 '{query}' 的图片到批次 {batch_date}, 排序:{order_by}, 页码:{page}, 每页:{per_page}")
-        return import_photos_by_query(query, count, batch_dir, order_by, per_page, page)
-    
-    else:
-        logger.error("未指定图片 ID 或搜索关键词")
-        return []
+    # 导入过程中索引只在内存中修改，结束时（包括出错）统一写回
+    try:
+        # 根据提供的参数选择导入方式
+        if photo_ids:
+            logger.info(f"开始导入指定 ID 的图片到批次 {batch_date}")
+            return import_photos_by_ids(photo_ids, batch_dir)
+        
+        elif query:
+            logger.info(f"开始导入关键词 '{query}' 的图片到批次 {batch_date}, 排序:{order_by}, 页码:{page}, 每页:{per_page}")
+            return import_photos_by_query(query, count, batch_dir, order_by, per_page, page)
+        
+        else:
+            logger.error("未指定图片 ID 或搜索关键词")
+            return []
+    finally:
+        flush_id_index()
 
 def print_usage():
     """打印使用帮助"""
@@ -666,6 +867,8 @@ def main():
     
     elif args.command == 'check-id':
         exists, path = check_id_exists(args.photo_id)
+        # 文件缺失的条目会从索引中移除
+        flush_id_index()
         if exists:
             print(f"ID {args.photo_id} 存在: {path}")
         else:
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import json
+from jsonio import write_images_json
 
 def update_tags():
     """将Apple Watch Series 3的标签从"apple"修改为"others"，同时更新两个文件"""
@@ -18,8 +19,7 @@ def update_tags():
             item['tags'] = ['others']
             print(f'已修改API文件中Apple Watch的标签: {item["tags"]}')
     
-    with open(api_file, 'w') as f:
-        json.dump(data, f, indent=2)
+    write_images_json(api_file, data)
     
     # 修改前端文件
     with open(frontend_file, 'r') as f:
@@ -30,8 +30,7 @@ def update_tags():
             item['tags'] = ['others']
             print(f'已修改前端文件中Apple Watch的标签: {item["tags"]}')
     
-    with open(frontend_file, 'w') as f:
-        json.dump(data, f, indent=2)
+    write_images_json(frontend_file, data)
     
     print('修改完成！')
 
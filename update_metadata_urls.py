@@ -10,6 +10,7 @@
 import os
 import json
 from datetime import datetime
+from jsonio import write_images_json
 
 # R2 公共URL
 r2_public_url = os.environ.get("R2_PUBLIC_URL", "https://pub-ee5efd5217f84e8e8d4d7e15827887c7.r2.dev")
@@ -89,15 +90,13 @@ def update_metadata_with_r2_urls(images_json_path=METADATA_FILE):
         print(f"已备份原始元数据文件: {backup_path}")
         
         # 写入更新后的元数据
-        with open(images_json_path, 'w', encoding='utf-8') as f:
-            json.dump(updated_images, f, indent=2, ensure_ascii=False)
+        write_images_json(images_json_path, updated_images)
         
         # 同时更新前端数据文件
         frontend_path = FRONTEND_DATA_FILE
         if os.path.exists(os.path.dirname(frontend_path)):
             os.makedirs(os.path.dirname(frontend_path), exist_ok=True)
-            with open(frontend_path, 'w', encoding='utf-8') as f:
-                json.dump(updated_images, f, indent=2, ensure_ascii=False)
+            write_images_json(frontend_path, updated_images)
             print(f"已更新前端数据文件: {frontend_path}")
         
         print(f"已更新元数据文件中的URL为R2 CDN: {images_json_path}")
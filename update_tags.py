@@ -15,6 +15,7 @@ import time
 import argparse
 import logging
 from datetime import datetime
+from jsonio import write_images_json
 from generate_metadata import classify_image_to_predefined_tags, extract_main_noun
 
 # 配置日志
@@ -55,8 +56,7 @@ def save_metadata(metadata, file_path):
         # 确保目录存在
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        write_images_json(file_path, metadata)
         
         logger.info(f"已保存元数据到: {file_path}")
         return True
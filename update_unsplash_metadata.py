@@ -15,6 +15,7 @@ import logging
 import argparse
 import re
 from datetime import datetime
+from jsonio import write_images_json
 
 # 导入unsplash_importer模块中的函数
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -71,8 +72,7 @@ def save_images_metadata(images_data):
     
     # 保存新文件
     try:
-        with open(IMAGES_JSON_FILE, 'w', encoding='utf-8') as f:
-            json.dump(images_data, f, indent=2, ensure_ascii=False)
+        write_images_json(IMAGES_JSON_FILE, images_data)
         logger.info(f"图片元数据已保存到: {IMAGES_JSON_FILE}")
     except Exception as e:
         logger.error(f"保存元数据文件失败: {e}")